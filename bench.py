@@ -0,0 +1,341 @@
+"""Microbenchmarks of the per-sample code paths.
+
+Run all benchmarks and store the results::
+
+    python -m custom_components.drea.bench --save bench-0.1.0.json
+
+Compare a later run against stored results, exiting with status 1 when a
+benchmark got slower than the threshold::
+
+    python -m custom_components.drea.bench --compare bench-0.1.0.json --threshold 10
+
+--check first compares the hue to RGBW table of the color rotation with
+the Home Assistant color functions and fails if any channel differs by
+more than COLOR_TOLERANCE.
+
+No Home Assistant instance is started. The transforms read lightweight
+state stand-ins, and the full message path runs against the stand-in for
+hass of the replay harness.
+
+Throughput is reported per sample. Allocations are the memory blocks that
+are still alive after a sample, measured while the results of 1000 runs
+are kept: for the pure functions this is what they return, for the
+message path it includes queued service calls.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable, Iterator
+import datetime
+import gc
+import json
+import math
+import platform
+import sys
+import timeit
+from types import MappingProxyType
+from typing import Any
+
+from . import async_route_message
+from .colortable import COLOR_TOLERANCE, get_hue_table, hs_to_rgbw
+from .dispatcher import merge_calls
+from .parser import convert_drea_data, decode_payload, encode_frame
+from .recognizer import GestureRecognizer
+from .replay import FakeHomeAssistant
+from .smoothing import SMOOTHING_ONE_EURO, RotationFilter
+from .handlers import get_handler
+
+SAMPLES_PER_PAYLOAD = 5
+ALLOCATION_RUNS = 1000
+REPEAT = 5
+
+
+class StubState:
+    """Stand-in for State with just what the transforms read."""
+
+    __slots__ = ("entity_id", "domain", "state", "attributes")
+
+    def __init__(self, entity_id: str, state: str, attributes: dict[str, Any]) -> None:
+        self.entity_id = entity_id
+        self.domain = entity_id.split(".", 1)[0]
+        self.state = state
+        self.attributes = MappingProxyType(attributes)
+
+
+LIGHT = StubState(
+    "light.bench",
+    "on",
+    {"brightness": 120, "hs_color": (30.0, 80.0), "color_temp": 300, "min_mireds": 153, "max_mireds": 500},
+)
+CLIMATE = StubState("climate.bench", "heat", {"temperature": 21.0, "min_temp": 7, "max_temp": 35})
+MEDIA_PLAYER = StubState("media_player.bench", "playing", {"volume_level": 0.3})
+
+TRANSFORMS = (
+    ("light", "brightness", LIGHT),
+    ("light", "color_temp", LIGHT),
+    ("light", "color", LIGHT),
+    ("light", "saturation", LIGHT),
+    ("light", "rgbw_color", LIGHT),
+    ("climate", "temperature", CLIMATE),
+    ("media_player", "volume_level", MEDIA_PLAYER),
+)
+
+
+def gesture_samples(start: int = 0, gestures: int = 1) -> Iterator[tuple[int, int, float | None, float | None]]:
+    """Yield two finger rotations of 100 samples at 100 Hz, each followed by a lift."""
+    timestamp = start
+    for _ in range(gestures):
+        for index in range(100):
+            yield timestamp, 2, -1.5, -1.5 * index
+            timestamp += 10
+        yield timestamp, 0, None, None
+        timestamp += 500
+
+
+def _rotations() -> Callable[[], float]:
+    rotations = [(-0.9 * index) % 180 - 90 for index in range(100)]
+    position = [0]
+
+    def next_rotation() -> float:
+        position[0] = (position[0] + 1) % 100
+        return rotations[position[0]]
+
+    return next_rotation
+
+
+def _bench_transform(domain: str, attribute: str, state: StubState) -> Callable[[], Any]:
+    transform = get_handler(domain, attribute).prepare(state.entity_id, state)
+    next_rotation = _rotations()
+    return lambda: transform(next_rotation())
+
+
+def _bench_prepare(domain: str, attribute: str, state: StubState) -> Callable[[], Any]:
+    prepare = get_handler(domain, attribute).prepare
+    return lambda: prepare(state.entity_id, state)
+
+
+def _bench_recognizer() -> Callable[[], Any]:
+    recognizer = GestureRecognizer()
+    samples = [convert_drea_data(",".join(map(str, sample))) for sample in gesture_samples(gestures=10)]
+    iterator = iter(())
+
+    def push() -> Any:
+        nonlocal iterator
+        sample = next(iterator, None)
+        if sample is None:
+            iterator = iter(samples)
+            sample = next(iterator)
+        return recognizer.push(sample)
+
+    return push
+
+
+def _bench_filter() -> Callable[[], Any]:
+    rotation_filter = RotationFilter(SMOOTHING_ONE_EURO, 1.0, 0.02, 0.5)
+    next_rotation = _rotations()
+    timestamp = [0]
+
+    def update() -> Any:
+        timestamp[0] += 10
+        return rotation_filter.update(timestamp[0], next_rotation())
+
+    return update
+
+
+def _bench_merge_calls() -> Callable[[], Any]:
+    pending = {
+        f"light.bench_{index}": ("light", "turn_on", {"entity_id": f"light.bench_{index}", "brightness": 100 + index % 2})
+        for index in range(4)
+    }
+    return lambda: merge_calls(pending)
+
+
+def _bench_hs_to_rgbw() -> Callable[[], Any]:
+    next_rotation = _rotations()
+    return lambda: hs_to_rgbw(next_rotation() + 90, 100.0)
+
+
+def _bench_hue_table() -> Callable[[], Any]:
+    table = get_hue_table()
+    next_rotation = _rotations()
+    return lambda: table.rgbw(next_rotation() + 90)
+
+
+def _text_payloads(gestures: int) -> list[str]:
+    lines = [",".join(map(str, sample)) for sample in gesture_samples(gestures=gestures)]
+    return ["\n".join(lines[index:index + SAMPLES_PER_PAYLOAD]) for index in range(0, len(lines), SAMPLES_PER_PAYLOAD)]
+
+
+def _frame_payloads(gestures: int) -> list[bytes]:
+    samples = list(gesture_samples(gestures=gestures))
+    return [encode_frame(samples[index:index + SAMPLES_PER_PAYLOAD]) for index in range(0, len(samples), SAMPLES_PER_PAYLOAD)]
+
+
+def _bench_decode(payload: str | bytes) -> Callable[[], Any]:
+    return lambda: list(decode_payload(payload))
+
+
+PURE_BENCHMARKS: dict[str, tuple[int, Callable[[], Callable[[], Any]]]] = {
+    "convert_drea_data": (1, lambda: lambda: convert_drea_data("1700000000000,2,-1.5,-42.75")),
+    "convert_drea_data_no_value": (1, lambda: lambda: convert_drea_data("1700000000000,0,None,None")),
+    "decode_payload_text": (SAMPLES_PER_PAYLOAD, lambda: _bench_decode(_text_payloads(1)[3])),
+    "decode_payload_frame": (SAMPLES_PER_PAYLOAD, lambda: _bench_decode(_frame_payloads(1)[3])),
+    "recognizer_push": (1, _bench_recognizer),
+    "rotation_filter_update": (1, _bench_filter),
+    "merge_calls": (1, _bench_merge_calls),
+    "hs_to_rgbw": (1, _bench_hs_to_rgbw),
+    "hue_table_rgbw": (1, _bench_hue_table),
+}
+for _domain, _attribute, _state in TRANSFORMS:
+    PURE_BENCHMARKS[f"prepare_{_attribute}"] = (1, lambda args=(_domain, _attribute, _state): _bench_prepare(*args))
+    PURE_BENCHMARKS[f"transform_{_attribute}"] = (1, lambda args=(_domain, _attribute, _state): _bench_transform(*args))
+
+MESSAGE_OPTIONS = {"two_finger_opt": "light.bench", "two_finger_attr": "brightness"}
+
+
+def _measure_pure(make_op: Callable[[], Callable[[], Any]], samples: int) -> dict[str, float]:
+    op = make_op()
+    timer = timeit.Timer(op)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(REPEAT, number)) / number
+
+    op = make_op()
+    kept = [None] * ALLOCATION_RUNS
+    gc.collect()
+    gc.disable()
+    try:
+        before = sys.getallocatedblocks()
+        for index in range(ALLOCATION_RUNS):
+            kept[index] = op()
+        blocks = sys.getallocatedblocks() - before
+    finally:
+        gc.enable()
+    return _result(best, samples, blocks / ALLOCATION_RUNS)
+
+
+def _route(hass: FakeHomeAssistant, payload: str | bytes) -> None:
+    async_route_message(hass, "drea/bench/data", payload)  # type: ignore[arg-type]
+    # process the queue right away instead of on the next loop turn
+    hass.data["drea"]["devices"]["bench"].async_process_samples()
+
+
+async def _async_measure_message(payloads: list[str] | list[bytes]) -> dict[str, float]:
+    loop = asyncio.get_running_loop()
+    best = math.inf
+    for _ in range(REPEAT):
+        # a fresh device per run, the stream must not go back in time
+        hass = FakeHomeAssistant(loop)
+        hass.states.async_set(LIGHT.entity_id, LIGHT.state, dict(LIGHT.attributes))
+        hass.add_device("bench", dict(MESSAGE_OPTIONS))
+        elapsed = timeit.Timer(lambda: [_route(hass, payload) for payload in payloads]).timeit(1)
+        best = min(best, elapsed / len(payloads))
+        hass.data["drea"]["devices"]["bench"].async_shutdown()
+        await hass.async_block_till_done()
+
+    hass = FakeHomeAssistant(loop)
+    hass.states.async_set(LIGHT.entity_id, LIGHT.state, dict(LIGHT.attributes))
+    hass.add_device("bench", dict(MESSAGE_OPTIONS))
+    gc.collect()
+    gc.disable()
+    try:
+        before = sys.getallocatedblocks()
+        for payload in payloads[:ALLOCATION_RUNS]:
+            _route(hass, payload)
+        blocks = sys.getallocatedblocks() - before
+    finally:
+        gc.enable()
+    hass.data["drea"]["devices"]["bench"].async_shutdown()
+    await hass.async_block_till_done()
+    return _result(best, SAMPLES_PER_PAYLOAD, blocks / min(len(payloads), ALLOCATION_RUNS))
+
+
+def _result(seconds_per_op: float, samples: int, blocks_per_op: float) -> dict[str, float]:
+    return {
+        "ops_per_s": round(samples / seconds_per_op, 1),
+        "ns_per_sample": round(seconds_per_op / samples * 1e9, 1),
+        "blocks_per_sample": round(blocks_per_op / samples, 2),
+    }
+
+
+def run_benchmarks(selected: str | None = None) -> dict[str, dict[str, float]]:
+    """Run the benchmarks whose name contains selected, or all."""
+    results = {}
+    for name, (samples, make_op) in PURE_BENCHMARKS.items():
+        if selected is None or selected in name:
+            results[name] = _measure_pure(make_op, samples)
+    for name, payloads in (
+        ("message_received_text", _text_payloads(40)),
+        ("message_received_frame", _frame_payloads(40)),
+    ):
+        if selected is None or selected in name:
+            results[name] = asyncio.run(_async_measure_message(payloads))
+    return results
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], threshold: float) -> list[str]:
+    """Print the change against a baseline, return the benchmarks slower than threshold percent."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:<32} {result['ops_per_s']:>14,.0f} ops/s  (new)")
+            continue
+        change = (result["ops_per_s"] / old["ops_per_s"] - 1) * 100
+        blocks = result["blocks_per_sample"] - old["blocks_per_sample"]
+        print(f"{name:<32} {result['ops_per_s']:>14,.0f} ops/s  {change:+7.1f} %  blocks {blocks:+.2f}")
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with results stored by --save")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    parser.add_argument(
+        "--check", action="store_true", help="check the hue table against the color functions before the run"
+    )
+    args = parser.parse_args(argv)
+
+    if args.check:
+        error = get_hue_table().max_error()
+        print(f"hue table: largest channel difference {error}, tolerance {COLOR_TOLERANCE}")
+        if error > COLOR_TOLERANCE:
+            sys.exit("hue table out of tolerance")
+
+    results = run_benchmarks(args.filter)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+    else:
+        regressions = []
+        print(f"{'benchmark':<32} {'ops/s':>14}  {'ns/sample':>10}  {'blocks/sample':>13}")
+        for name, result in results.items():
+            print(
+                f"{name:<32} {result['ops_per_s']:>14,.0f}  {result['ns_per_sample']:>10}  "
+                f"{result['blocks_per_sample']:>13}"
+            )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+    if regressions:
+        sys.exit(f"slower than {args.threshold} %: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
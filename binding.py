@@ -0,0 +1,118 @@
+"""Binding table from finger count to the controlled entities.
+
+The table is resolved from the options and a state lookup alone. The
+registries of a hass instance come in through catalog.build_binding_table.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Mapping
+from types import MappingProxyType
+from typing import Any, NamedTuple
+
+from .core import ATTR_ENTITY_ID, State
+from .handlers import TapAction, get_handler, get_tap_action, supported_domains
+from .transforms import PrepareTransform
+
+FINGER_OPTIONS = {
+    2: ("two_finger_opt", "two_finger_attr", "two_finger_area"),
+    3: ("three_finger_opt", "three_finger_attr", "three_finger_area"),
+    4: ("four_finger_opt", "four_finger_attr", "four_finger_area"),
+    5: ("five_finger_opt", "five_finger_attr", "five_finger_area"),
+}
+
+
+class BindingTarget(NamedTuple):
+    """One entity controlled by a binding."""
+
+    entity_id: str
+    domain: str
+    service: str | None
+    prepare_transform: PrepareTransform | None
+    tap: TapAction | None
+
+
+class Binding(NamedTuple):
+    """Entities and attribute bound to one finger count."""
+
+    # the entity option of the slot, also the dispatcher target of the binding
+    key: str
+    attribute: str | None
+    area_id: str | None
+    targets: tuple[BindingTarget, ...]
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the controlled entity ids."""
+        return [target.entity_id for target in self.targets]
+
+
+def as_entity_list(value: str | Iterable[str] | None) -> list[str]:
+    """Return an entity option as a list, single entities were stored as a string."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def configured_entities(options: Mapping[str, Any]) -> list[str]:
+    """Return the entity ids named in the options, before groups are expanded."""
+    entity_ids: dict[str, None] = {}
+    for entity_option, _, _ in FINGER_OPTIONS.values():
+        entity_ids.update(dict.fromkeys(as_entity_list(options.get(entity_option))))
+    return list(entity_ids)
+
+
+def expand_entities(get_state: Callable[[str], State | None], pending: list[str]) -> list[str]:
+    """Expand the groups among the entity ids into their members."""
+    entity_ids: dict[str, None] = {}
+    domains = supported_domains()
+    seen = set()
+    while pending:
+        entity_id = pending.pop(0)
+        if entity_id in seen:
+            continue
+        seen.add(entity_id)
+        state = get_state(entity_id)
+        members = state.attributes.get(ATTR_ENTITY_ID) if state is not None else None
+        if isinstance(members, (list, tuple)):
+            # light, media player and old style groups, each member keeps its own value
+            pending[:0] = members
+        elif entity_id.split(".", 1)[0] in domains:
+            entity_ids[entity_id] = None
+    return list(entity_ids)
+
+
+def build_bindings(
+    options: Mapping[str, Any],
+    get_state: Callable[[str], State | None],
+    supports: Callable[[str, str], bool] | None = None,
+    area_entity_ids: Callable[[str], list[str]] | None = None,
+) -> Mapping[int, Binding]:
+    """Resolve binding options against entity states, without the registries of a hass instance.
+
+    supports None treats every entity as supporting the bound attribute,
+    area_entity_ids None ignores the area options.
+    """
+    table = {}
+    for finger_count, (entity_option, attribute_option, area_option) in FINGER_OPTIONS.items():
+        area_id = options.get(area_option) or None
+        pending = as_entity_list(options.get(entity_option))
+        if area_id and area_entity_ids is not None:
+            pending.extend(area_entity_ids(area_id))
+        entity_ids = expand_entities(get_state, pending)
+        if not entity_ids:
+            continue
+        attribute = options.get(attribute_option) or None
+        targets = []
+        for entity_id in entity_ids:
+            domain = entity_id.split(".", 1)[0]
+            handler = get_handler(domain, attribute)
+            if handler is not None and (supports is None or supports(entity_id, handler.attribute)):
+                target = BindingTarget(entity_id, domain, handler.service, handler.prepare, handler.tap)
+            else:
+                # not rotated, a tap still toggles it
+                target = BindingTarget(entity_id, domain, None, None, get_tap_action(domain, attribute))
+            targets.append(target)
+        table[finger_count] = Binding(entity_option, attribute, area_id, tuple(targets))
+    return MappingProxyType(table)
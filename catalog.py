@@ -0,0 +1,144 @@
+"""Index of the entities DREA can control and their controllable attributes.
+
+The index is built once from the state machine and then kept current from
+state_changed events of the supported domains. Areas are resolved from the
+entity and device registries on first use and resolved again after a
+registry change. The config flow and the binding resolver share one
+catalog per Home Assistant instance.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Mapping
+from typing import Any
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from .binding import Binding, as_entity_list, build_bindings, expand_entities
+from .const import DATA_CATALOG, DOMAIN
+from .handlers import entity_attributes, supported_domains
+
+
+class EntityCatalog:
+    """Supported entities, their controllable attributes and the area index."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self._domains = supported_domains()
+        self._prefixes = tuple(f"{domain}." for domain in self._domains)
+        self._attributes: dict[str, tuple[str, ...]] = {}
+        self._areas: dict[str, list[str]] | None = None
+        self._area_listeners: list[Callable[[], None]] = []
+        self._unsubscribe: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_start(self) -> None:
+        """Index the current states and follow the changes."""
+        for state in self.hass.states.async_all(set(self._domains)):
+            self._attributes[state.entity_id] = entity_attributes(state)
+        bus = self.hass.bus
+        self._unsubscribe = [
+            bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed, event_filter=self._async_supported_entity),
+            bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_registry_updated),
+            bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_registry_updated),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following the changes."""
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
+
+    def entity_ids(self, domains: Iterable[str] | None = None) -> list[str]:
+        """Return the indexed entities, optionally only those of some domains."""
+        if domains is None:
+            return list(self._attributes)
+        prefixes = tuple(f"{domain}." for domain in domains)
+        return [entity_id for entity_id in self._attributes if entity_id.startswith(prefixes)]
+
+    def attributes(self, entity_id: str) -> tuple[str, ...]:
+        """Return the controllable attributes of an entity."""
+        return self._attributes.get(entity_id, ())
+
+    def supports(self, entity_id: str, attribute: str) -> bool:
+        """Return False if the entity is known not to support the attribute."""
+        attributes = self._attributes.get(entity_id)
+        return attributes is None or attribute in attributes
+
+    def area_entity_ids(self, area_id: str) -> list[str]:
+        """Return the supported entities of an area, including those of its devices."""
+        if self._areas is None:
+            self._areas = self._build_area_index()
+        return self._areas.get(area_id, [])
+
+    @callback
+    def async_add_area_listener(self, listener: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call listener after entities or devices may have moved between areas."""
+        self._area_listeners.append(listener)
+        return lambda: self._area_listeners.remove(listener)
+
+    def _build_area_index(self) -> dict[str, list[str]]:
+        device_registry = dr.async_get(self.hass)
+        areas: dict[str, list[str]] = {}
+        for entry in er.async_get(self.hass).entities.values():
+            if entry.disabled_by is not None or entry.domain not in self._domains:
+                continue
+            area_id = entry.area_id
+            if area_id is None and entry.device_id is not None:
+                device = device_registry.async_get(entry.device_id)
+                area_id = device.area_id if device is not None else None
+            if area_id is not None:
+                areas.setdefault(area_id, []).append(entry.entity_id)
+        return areas
+
+    @callback
+    def _async_supported_entity(self, event: Event) -> bool:
+        return event.data["entity_id"].startswith(self._prefixes)
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        entity_id = event.data["entity_id"]
+        new_state = event.data["new_state"]
+        if new_state is None:
+            self._attributes.pop(entity_id, None)
+        else:
+            self._attributes[entity_id] = entity_attributes(new_state)
+
+    @callback
+    def _async_registry_updated(self, event: Event) -> None:
+        if event.event_type == er.EVENT_ENTITY_REGISTRY_UPDATED and event.data.get("action") == "update":
+            old_entity_id = event.data.get("old_entity_id")
+            if old_entity_id is not None:
+                self._attributes.pop(old_entity_id, None)
+        self._areas = None
+        for listener in list(self._area_listeners):
+            listener()
+
+
+@callback
+def async_get_catalog(hass: HomeAssistant) -> EntityCatalog:
+    """Return the shared catalog, starting it on first use."""
+    data = hass.data.setdefault(DOMAIN, {})
+    catalog = data.get(DATA_CATALOG)
+    if catalog is None:
+        catalog = data[DATA_CATALOG] = EntityCatalog(hass)
+        catalog.async_start()
+    return catalog
+
+
+def resolve_binding_entities(
+    hass: HomeAssistant, entities: str | Iterable[str] | None, area_id: str | None = None
+) -> list[str]:
+    """Expand groups and an area into the entity ids they contain."""
+    pending = as_entity_list(entities)
+    if area_id:
+        pending.extend(async_get_catalog(hass).area_entity_ids(area_id))
+    return expand_entities(hass.states.get, pending)
+
+
+def build_binding_table(hass: HomeAssistant, options: Mapping[str, Any]) -> Mapping[int, Binding]:
+    """Resolve the options of a config entry into an immutable binding table."""
+    catalog = async_get_catalog(hass)
+    return build_bindings(options, hass.states.get, catalog.supports, catalog.area_entity_ids)
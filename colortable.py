@@ -0,0 +1,72 @@
+"""Lookup table from hue to the RGBW color of a fully saturated light.
+
+Converting a hue with color_hs_to_RGB and color_rgb_to_rgbw costs several
+microseconds per sample. hs_to_rgbw does the same conversion as these Home
+Assistant color functions, without importing Home Assistant. The table
+holds the converted colors for every multiple of the resolution, so a color
+rotation only looks up the nearest entry. Tables are built on first use and
+shared by all devices.
+
+The RGBW rotation quantizes the hue to HUE_STEP and uses a table at that
+resolution, so it only ever reads exact entries. HUE_TABLE_RESOLUTION is
+the default for any other hue, its nearest entry stays within
+COLOR_TOLERANCE of the color functions.
+"""
+from __future__ import annotations
+
+from array import array
+import colorsys
+
+# degrees of hue between two entries of the default table
+HUE_TABLE_RESOLUTION = 0.5
+# largest RGBW channel difference of the default table to the color functions
+COLOR_TOLERANCE = 2
+
+_tables: dict[float, HueTable] = {}
+
+
+def hs_to_rgbw(hue: float, saturation: float) -> tuple[int, int, int, int]:
+    """Convert a color at full brightness as color_hs_to_RGB and color_rgb_to_rgbw do."""
+    r, g, b = (int(channel * 255) for channel in colorsys.hsv_to_rgb(hue / 360, saturation / 100, 1.0))
+    w = min(r, g, b)
+    rgbw = (r - w, g - w, b - w, w)
+    # the brightest output channel matches the brightest input channel
+    max_out = max(rgbw)
+    factor = max(r, g, b) / max_out if max_out else 0.0
+    return tuple(int(round(channel * factor)) for channel in rgbw)  # type: ignore[return-value]
+
+
+class HueTable:
+    """RGBW colors of the hues of the color wheel at full saturation."""
+
+    __slots__ = ("resolution", "size", "_rgbw")
+
+    def __init__(self, resolution: float) -> None:
+        self.resolution = resolution
+        self.size = size = round(360.0 / resolution)
+        rgbw = array("B")
+        for index in range(size):
+            rgbw.extend(hs_to_rgbw(index * 360.0 / size, 100.0))
+        self._rgbw = rgbw
+
+    def rgbw(self, hue: float) -> list[int]:
+        """Return the RGBW color of the nearest hue in the table."""
+        offset = round(hue * self.size / 360.0) % self.size * 4
+        return self._rgbw[offset:offset + 4].tolist()
+
+    def max_error(self, step: float = 0.1) -> int:
+        """Return the largest channel difference to the color functions for hues step degrees apart."""
+        error = 0
+        for index in range(round(360.0 / step)):
+            hue = index * step
+            expected = hs_to_rgbw(hue, 100.0)
+            error = max(error, *(abs(a - b) for a, b in zip(self.rgbw(hue), expected)))
+        return error
+
+
+def get_hue_table(resolution: float = HUE_TABLE_RESOLUTION) -> HueTable:
+    """Return the shared table of a resolution, building it on first use."""
+    table = _tables.get(resolution)
+    if table is None:
+        table = _tables[resolution] = HueTable(resolution)
+    return table
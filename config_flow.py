@@ -13,43 +13,85 @@ from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.core import callback
 from homeassistant.helpers.selector import (
+    AreaSelector,
+    BooleanSelector,
     EntitySelector,
     EntitySelectorConfig,
+    NumberSelector,
+    NumberSelectorConfig,
+    NumberSelectorMode,
     SelectSelector,
     SelectSelectorConfig,
     SelectSelectorMode,
 )
 
-from .const import DOMAIN
+from .const import (
+    CONF_DEAD_ZONE,
+    CONF_DEVICE_ID,
+    CONF_DOUBLE_TAP_WINDOW,
+    CONF_FEEDBACK_RATE,
+    CONF_FINGER_HYSTERESIS,
+    CONF_FLING_VELOCITY,
+    CONF_LAST_MESSAGE_ENTITY,
+    CONF_LONG_PRESS_DURATION,
+    CONF_MAX_COMMAND_RATE,
+    CONF_MAX_IN_FLIGHT,
+    CONF_MAX_SAMPLE_AGE,
+    CONF_METRICS,
+    CONF_ROTATION_THRESHOLD,
+    CONF_SMOOTHING,
+    CONF_SMOOTHING_BETA,
+    CONF_SMOOTHING_MIN_CUTOFF,
+    CONF_TAP_MAX_DURATION,
+    CONF_TAP_MIN_DURATION,
+    DEFAULT_DEAD_ZONE,
+    DEFAULT_DOUBLE_TAP_WINDOW,
+    DEFAULT_FEEDBACK_RATE,
+    DEFAULT_FINGER_HYSTERESIS,
+    DEFAULT_FLING_VELOCITY,
+    DEFAULT_LAST_MESSAGE_ENTITY,
+    DEFAULT_LONG_PRESS_DURATION,
+    DEFAULT_MAX_COMMAND_RATE,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_SAMPLE_AGE,
+    DEFAULT_METRICS,
+    DEFAULT_ROTATION_THRESHOLD,
+    DEFAULT_SMOOTHING,
+    DEFAULT_SMOOTHING_BETA,
+    DEFAULT_SMOOTHING_MIN_CUTOFF,
+    DEFAULT_TAP_MAX_DURATION,
+    DEFAULT_TAP_MIN_DURATION,
+    DOMAIN,
+)
+from .binding import as_entity_list
+from .catalog import async_get_catalog, resolve_binding_entities
+from .handlers import supported_domains
+from .smoothing import SMOOTHING_MODES
 
 _LOGGER = logging.getLogger(__name__)
 
-# TODO adjust the data schema to the data that you need
 DATA_SCHEMA = vol.Schema(
     {
-        vol.Required("five_finger"): str,
+        vol.Required(CONF_DEVICE_ID): str,
     }
 )
 
-SUPPORTED_DOMAINS = [
-    "light",
-    "media_player",
-    "climate"
-]
-
-
 class SimpleConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Drea."""
 
-    VERSION = 1
+    VERSION = 2
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         if user_input is None:
-            return self.async_show_form(step_id="user")
+            return self.async_show_form(step_id="user", data_schema=DATA_SCHEMA)
+
+        device_id = user_input[CONF_DEVICE_ID].strip()
+        await self.async_set_unique_id(device_id)
+        self._abort_if_unique_id_configured()
 
-        return self.async_create_entry(title=DOMAIN, data=user_input)
+        return self.async_create_entry(title=f"DREA {device_id}", data={CONF_DEVICE_ID: device_id})
 
     @staticmethod
     @callback
@@ -69,31 +111,43 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
     ) -> FlowResult:
 
         if user_input is not None:
-            user_input.update(self.drea_options)
-            return self.async_create_entry(title="", data=user_input)
+            self.drea_options.update(user_input)
+            return await self.async_step_gestures()
 
         data_schema = {}
 
-        if self.drea_options.get("five_finger_opt") is not None:
-            attributes = _async_get_attributes_by_entity(self.hass, self.drea_options.get("five_finger_opt"))
+        entity_ids = resolve_binding_entities(
+            self.hass, self.drea_options.get("five_finger_opt"), self.drea_options.get("five_finger_area")
+        )
+        if entity_ids:
+            attributes = _async_get_attributes_by_entities(self.hass, entity_ids)
             data_schema[vol.Required("five_finger_attr", default=self.config_entry.options.get("five_finger_attr"))] = SelectSelector(
                 SelectSelectorConfig(options=attributes, mode=SelectSelectorMode.DROPDOWN)
             )
 
-        if self.drea_options.get("four_finger_opt") is not None:
-            attributes = _async_get_attributes_by_entity(self.hass, self.drea_options.get("four_finger_opt"))
+        entity_ids = resolve_binding_entities(
+            self.hass, self.drea_options.get("four_finger_opt"), self.drea_options.get("four_finger_area")
+        )
+        if entity_ids:
+            attributes = _async_get_attributes_by_entities(self.hass, entity_ids)
             data_schema[vol.Required("four_finger_attr", default=self.config_entry.options.get("four_finger_attr"))] = SelectSelector(
                 SelectSelectorConfig(options=attributes, mode=SelectSelectorMode.DROPDOWN)
             )
 
-        if self.drea_options.get("three_finger_opt") is not None:
-            attributes = _async_get_attributes_by_entity(self.hass, self.drea_options.get("three_finger_opt"))
+        entity_ids = resolve_binding_entities(
+            self.hass, self.drea_options.get("three_finger_opt"), self.drea_options.get("three_finger_area")
+        )
+        if entity_ids:
+            attributes = _async_get_attributes_by_entities(self.hass, entity_ids)
             data_schema[vol.Required("three_finger_attr", default=self.config_entry.options.get("three_finger_attr"))] = SelectSelector(
                 SelectSelectorConfig(options=attributes, mode=SelectSelectorMode.DROPDOWN)
             )
 
-        if self.drea_options.get("two_finger_opt") is not None:
-            attributes = _async_get_attributes_by_entity(self.hass, self.drea_options.get("two_finger_opt"))
+        entity_ids = resolve_binding_entities(
+            self.hass, self.drea_options.get("two_finger_opt"), self.drea_options.get("two_finger_area")
+        )
+        if entity_ids:
+            attributes = _async_get_attributes_by_entities(self.hass, entity_ids)
             data_schema[vol.Required("two_finger_attr", default=self.config_entry.options.get("two_finger_attr"))] = SelectSelector(
                 SelectSelectorConfig(options=attributes, mode=SelectSelectorMode.DROPDOWN)
             )
@@ -103,6 +157,92 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             data_schema=vol.Schema(data_schema),
         )
 
+    async def async_step_gestures(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the gesture thresholds."""
+
+        if user_input is not None:
+            user_input.update(self.drea_options)
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="gestures",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_TAP_MIN_DURATION,
+                        default=options.get(CONF_TAP_MIN_DURATION, DEFAULT_TAP_MIN_DURATION),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=2000, step=10, mode=NumberSelectorMode.BOX, unit_of_measurement="ms")
+                    ),
+                    vol.Optional(
+                        CONF_TAP_MAX_DURATION,
+                        default=options.get(CONF_TAP_MAX_DURATION, DEFAULT_TAP_MAX_DURATION),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=2000, step=10, mode=NumberSelectorMode.BOX, unit_of_measurement="ms")
+                    ),
+                    vol.Optional(
+                        CONF_ROTATION_THRESHOLD,
+                        default=options.get(CONF_ROTATION_THRESHOLD, DEFAULT_ROTATION_THRESHOLD),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=90, step=0.5, mode=NumberSelectorMode.BOX, unit_of_measurement="°")
+                    ),
+                    vol.Optional(
+                        CONF_FINGER_HYSTERESIS,
+                        default=options.get(CONF_FINGER_HYSTERESIS, DEFAULT_FINGER_HYSTERESIS),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=20, step=1, mode=NumberSelectorMode.BOX)
+                    ),
+                    vol.Optional(
+                        CONF_DOUBLE_TAP_WINDOW,
+                        default=options.get(CONF_DOUBLE_TAP_WINDOW, DEFAULT_DOUBLE_TAP_WINDOW),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=1000, step=10, mode=NumberSelectorMode.BOX, unit_of_measurement="ms")
+                    ),
+                    vol.Optional(
+                        CONF_LONG_PRESS_DURATION,
+                        default=options.get(CONF_LONG_PRESS_DURATION, DEFAULT_LONG_PRESS_DURATION),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=5000, step=50, mode=NumberSelectorMode.BOX, unit_of_measurement="ms")
+                    ),
+                    vol.Optional(
+                        CONF_FLING_VELOCITY,
+                        default=options.get(CONF_FLING_VELOCITY, DEFAULT_FLING_VELOCITY),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=5000, step=10, mode=NumberSelectorMode.BOX, unit_of_measurement="°/s")
+                    ),
+                    vol.Optional(
+                        CONF_SMOOTHING,
+                        default=options.get(CONF_SMOOTHING, DEFAULT_SMOOTHING),
+                    ): SelectSelector(
+                        SelectSelectorConfig(
+                            options=SMOOTHING_MODES, mode=SelectSelectorMode.DROPDOWN, translation_key=CONF_SMOOTHING
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_SMOOTHING_MIN_CUTOFF,
+                        default=options.get(CONF_SMOOTHING_MIN_CUTOFF, DEFAULT_SMOOTHING_MIN_CUTOFF),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0.1, max=20, step=0.1, mode=NumberSelectorMode.BOX, unit_of_measurement="Hz")
+                    ),
+                    vol.Optional(
+                        CONF_SMOOTHING_BETA,
+                        default=options.get(CONF_SMOOTHING_BETA, DEFAULT_SMOOTHING_BETA),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=1, step=0.001, mode=NumberSelectorMode.BOX)
+                    ),
+                    vol.Optional(
+                        CONF_DEAD_ZONE,
+                        default=options.get(CONF_DEAD_ZONE, DEFAULT_DEAD_ZONE),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=20, step=0.1, mode=NumberSelectorMode.BOX, unit_of_measurement="°")
+                    ),
+                }
+            ),
+        )
+
     async def async_step_init(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -112,7 +252,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             self.drea_options.update(user_input)
             return await self.async_step_attribute()
 
-        supported_entities = _async_get_entities_by_filter(self.hass, SUPPORTED_DOMAINS)
+        supported_entities = _async_get_entities_by_filter(self.hass, supported_domains())
 
         return self.async_show_form(
             step_id="init",
@@ -120,20 +260,68 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 {
                     vol.Optional(
                         "five_finger_opt",
-                        default=self.config_entry.options.get("five_finger_opt"),
-                    ): EntitySelector(EntitySelectorConfig(include_entities=supported_entities)),
+                        default=as_entity_list(self.config_entry.options.get("five_finger_opt")),
+                    ): EntitySelector(EntitySelectorConfig(include_entities=supported_entities, multiple=True)),
+                    vol.Optional(
+                        "five_finger_area",
+                        description={"suggested_value": self.config_entry.options.get("five_finger_area")},
+                    ): AreaSelector(),
                     vol.Optional(
                         "four_finger_opt",
-                        default=self.config_entry.options.get("four_finger_opt"),
-                    ): EntitySelector(EntitySelectorConfig(include_entities=supported_entities)),
+                        default=as_entity_list(self.config_entry.options.get("four_finger_opt")),
+                    ): EntitySelector(EntitySelectorConfig(include_entities=supported_entities, multiple=True)),
+                    vol.Optional(
+                        "four_finger_area",
+                        description={"suggested_value": self.config_entry.options.get("four_finger_area")},
+                    ): AreaSelector(),
                     vol.Optional(
                         "three_finger_opt",
-                        default=self.config_entry.options.get("three_finger_opt"),
-                    ): EntitySelector(EntitySelectorConfig(include_entities=supported_entities)),
+                        default=as_entity_list(self.config_entry.options.get("three_finger_opt")),
+                    ): EntitySelector(EntitySelectorConfig(include_entities=supported_entities, multiple=True)),
+                    vol.Optional(
+                        "three_finger_area",
+                        description={"suggested_value": self.config_entry.options.get("three_finger_area")},
+                    ): AreaSelector(),
                     vol.Optional(
                         "two_finger_opt",
-                        default=self.config_entry.options.get("two_finger_opt"),
-                    ): EntitySelector(EntitySelectorConfig(include_entities=supported_entities)),
+                        default=as_entity_list(self.config_entry.options.get("two_finger_opt")),
+                    ): EntitySelector(EntitySelectorConfig(include_entities=supported_entities, multiple=True)),
+                    vol.Optional(
+                        "two_finger_area",
+                        description={"suggested_value": self.config_entry.options.get("two_finger_area")},
+                    ): AreaSelector(),
+                    vol.Optional(
+                        CONF_LAST_MESSAGE_ENTITY,
+                        default=self.config_entry.options.get(CONF_LAST_MESSAGE_ENTITY, DEFAULT_LAST_MESSAGE_ENTITY),
+                    ): BooleanSelector(),
+                    vol.Optional(
+                        CONF_MAX_COMMAND_RATE,
+                        default=self.config_entry.options.get(CONF_MAX_COMMAND_RATE, DEFAULT_MAX_COMMAND_RATE),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=1, max=50, step=1, mode=NumberSelectorMode.BOX, unit_of_measurement="1/s")
+                    ),
+                    vol.Optional(
+                        CONF_MAX_IN_FLIGHT,
+                        default=self.config_entry.options.get(CONF_MAX_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=1, max=5, step=1, mode=NumberSelectorMode.BOX)
+                    ),
+                    vol.Optional(
+                        CONF_MAX_SAMPLE_AGE,
+                        default=self.config_entry.options.get(CONF_MAX_SAMPLE_AGE, DEFAULT_MAX_SAMPLE_AGE),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=10000, step=50, mode=NumberSelectorMode.BOX, unit_of_measurement="ms")
+                    ),
+                    vol.Optional(
+                        CONF_FEEDBACK_RATE,
+                        default=self.config_entry.options.get(CONF_FEEDBACK_RATE, DEFAULT_FEEDBACK_RATE),
+                    ): NumberSelector(
+                        NumberSelectorConfig(min=0, max=20, step=1, mode=NumberSelectorMode.BOX, unit_of_measurement="1/s")
+                    ),
+                    vol.Optional(
+                        CONF_METRICS,
+                        default=self.config_entry.options.get(CONF_METRICS, DEFAULT_METRICS),
+                    ): BooleanSelector(),
                 }
             ),
         )
@@ -152,40 +340,18 @@ def _async_get_entities_by_filter(
         domains: list[str] | None = None,
 ) -> list[str]:
     """Fetch all entities or entities in the given domains."""
-    list = []
-    for state in hass.states.async_all(domains and set(domains)):
-        list.append(state.entity_id)
-    return list
+    return async_get_catalog(hass).entity_ids(domains)
 
 
-def _async_get_attributes_by_entity(
+def _async_get_attributes_by_entities(
         hass: HomeAssistant,
-        entity_id: str
-)-> list[str]:
-    """Fetch all entities or entities in the given domains."""
-    entity_dict = hass.states.get(entity_id).as_dict()
-    attr_keys = entity_dict.get("attributes").keys()
-
-    domain = entity_id.split(".", 2)[0]
-
+        entity_ids: list[str]
+) -> list[str]:
+    """Fetch the attributes any of the entities supports."""
+    catalog = async_get_catalog(hass)
     attr_list = []
-
-    if domain == "light":
-        attr_list.append("brightness")
-        if "hs" in entity_dict.get("attributes").get("supported_color_modes") or "xy" in entity_dict.get("attributes").get("supported_color_modes") or "rgb" in entity_dict.get("attributes").get("supported_color_modes"):
-            attr_list.append("color")
-            attr_list.append("saturation")
-        if "color_temp" in entity_dict.get("attributes").get("supported_color_modes"):
-            attr_list.append("color_temp")
-        if "rgbw" in entity_dict.get("attributes").get("supported_color_modes"):
-            attr_list.append("rgbw_color")
-
-    elif domain == "climate":
-        if "temperature" in attr_keys:
-            attr_list.append("temperature")
-
-    elif domain == "media_player":
-        if "volume_level" in attr_keys:
-            attr_list.append("volume_level")
-
-    return list(attr_list)
+    for entity_id in entity_ids:
+        for attribute in catalog.attributes(entity_id):
+            if attribute not in attr_list:
+                attr_list.append(attribute)
+    return attr_list
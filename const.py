@@ -1,3 +1,74 @@
 """Constants for the Drea integration."""
+from datetime import timedelta
 
 DOMAIN = "drea"
+
+CONF_DEVICE_ID = "device_id"
+LEGACY_DEVICE_ID = "drea"
+
+TOPIC_SUBSCRIBE = "drea/+/data"
+TOPIC_DATA = "drea/{}/data"
+TOPIC_FEEDBACK = "drea/{}/feedback"
+# the single knob of version 1 entries publishes on the bare topic
+TOPIC_LEGACY = "drea"
+
+ENTITY_LAST_MESSAGE = "drea.{}_last_message"
+# the state view of the single knob before device ids, kept for existing automations
+ENTITY_LEGACY_LAST_MESSAGE = "drea.last_message"
+LAST_MESSAGE_UPDATE_INTERVAL = timedelta(seconds=5)
+
+CONF_LAST_MESSAGE_ENTITY = "last_message_entity"
+DEFAULT_LAST_MESSAGE_ENTITY = True
+
+DATA_DEVICES = "devices"
+DATA_CATALOG = "catalog"
+DATA_SUBSCRIBE_LOCK = "subscribe_lock"
+DATA_UNSUBSCRIBE = "unsubscribe"
+
+CONF_MAX_COMMAND_RATE = "max_command_rate"
+CONF_MAX_IN_FLIGHT = "max_in_flight"
+DEFAULT_MAX_COMMAND_RATE = 10.0
+DEFAULT_MAX_IN_FLIGHT = 1
+
+CONF_FEEDBACK_RATE = "feedback_rate"
+# feedback messages per second, 0 disables the feedback
+DEFAULT_FEEDBACK_RATE = 5.0
+
+CONF_MAX_SAMPLE_AGE = "max_sample_age"
+# milliseconds a sample may arrive later than the fastest recent sample, 0 disables the check
+DEFAULT_MAX_SAMPLE_AGE = 1000
+MAX_QUEUED_SAMPLES = 64
+
+CONF_METRICS = "metrics"
+DEFAULT_METRICS = False
+METRICS_WINDOW = timedelta(seconds=30)
+# device to HA latencies above this are clock offsets, not delays
+MAX_DEVICE_LATENCY = 60.0
+
+EVENT_GESTURE = "drea_gesture"
+CONF_TAP_MIN_DURATION = "tap_min_duration"
+CONF_TAP_MAX_DURATION = "tap_max_duration"
+CONF_ROTATION_THRESHOLD = "rotation_threshold"
+CONF_FINGER_HYSTERESIS = "finger_hysteresis"
+CONF_DOUBLE_TAP_WINDOW = "double_tap_window"
+CONF_LONG_PRESS_DURATION = "long_press_duration"
+CONF_FLING_VELOCITY = "fling_velocity"
+# durations in milliseconds of the knob clock, angles in degrees
+DEFAULT_TAP_MIN_DURATION = 200
+DEFAULT_TAP_MAX_DURATION = 800
+DEFAULT_ROTATION_THRESHOLD = 5.0
+DEFAULT_FINGER_HYSTERESIS = 2
+# 0 disables double taps, single taps are then handled on lift without waiting
+DEFAULT_DOUBLE_TAP_WINDOW = 0
+DEFAULT_LONG_PRESS_DURATION = 1000
+# 0 disables flings
+DEFAULT_FLING_VELOCITY = 0.0
+CONF_SMOOTHING = "smoothing"
+CONF_SMOOTHING_MIN_CUTOFF = "smoothing_min_cutoff"
+CONF_SMOOTHING_BETA = "smoothing_beta"
+CONF_DEAD_ZONE = "dead_zone"
+DEFAULT_SMOOTHING = "none"
+# Hz, and Hz per degree per second of rotation speed
+DEFAULT_SMOOTHING_MIN_CUTOFF = 1.0
+DEFAULT_SMOOTHING_BETA = 0.02
+DEFAULT_DEAD_ZONE = 0.0
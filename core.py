@@ -0,0 +1,60 @@
+"""The parts of Home Assistant the gesture engine relies on, without Home Assistant.
+
+The engine, the dispatcher and the transforms only import this module, so
+they run wherever the runner runs. The constants have the values of
+homeassistant.const and the State protocol is met by homeassistant.core.State.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine, Mapping
+from typing import Any, Protocol, TypeVar
+
+_CallableT = TypeVar("_CallableT", bound=Callable[..., Any])
+
+ATTR_ENTITY_ID = "entity_id"
+ATTR_SUPPORTED_FEATURES = "supported_features"
+
+STATE_ON = "on"
+STATE_OFF = "off"
+STATE_OPEN = "open"
+STATE_OPENING = "opening"
+STATE_CLOSED = "closed"
+STATE_UNAVAILABLE = "unavailable"
+STATE_UNKNOWN = "unknown"
+
+# the running tasks, the event loop only keeps weak references
+_tasks: set[asyncio.Task] = set()
+
+
+class State(Protocol):
+    """The state of an entity as the engine reads it."""
+
+    @property
+    def entity_id(self) -> str:
+        """Return the entity id."""
+
+    @property
+    def domain(self) -> str:
+        """Return the domain of the entity."""
+
+    @property
+    def state(self) -> str:
+        """Return the state."""
+
+    @property
+    def attributes(self) -> Mapping[str, Any]:
+        """Return the state attributes."""
+
+
+def callback(func: _CallableT) -> _CallableT:
+    """Mark a function as safe to run in the event loop, as homeassistant.core.callback does."""
+    setattr(func, "_hass_callback", True)
+    return func
+
+
+def async_create_task(loop: asyncio.AbstractEventLoop, coro: Coroutine[Any, Any, None]) -> None:
+    """Run a coroutine in the background, keeping a reference until it is done."""
+    task = loop.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,157 @@
+"""Runtime state of one DREA device."""
+from __future__ import annotations
+
+from datetime import datetime
+from functools import partial
+import logging
+from typing import Any
+
+from homeassistant.components import mqtt
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.util import slugify
+
+from .const import (
+    CONF_DEVICE_ID,
+    CONF_LAST_MESSAGE_ENTITY,
+    CONF_METRICS,
+    DEFAULT_FEEDBACK_RATE,
+    DEFAULT_LAST_MESSAGE_ENTITY,
+    DEFAULT_MAX_COMMAND_RATE,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_METRICS,
+    ENTITY_LAST_MESSAGE,
+    ENTITY_LEGACY_LAST_MESSAGE,
+    EVENT_GESTURE,
+    LEGACY_DEVICE_ID,
+    TOPIC_FEEDBACK,
+)
+from .binding import configured_entities
+from .catalog import build_binding_table
+from .dispatcher import ServiceDispatcher
+from .engine import DreaEngine
+from .feedback import FeedbackPublisher
+from .stats import DeviceMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_call_service(hass: HomeAssistant, domain: str, service: str, data: dict[str, Any]) -> None:
+    """Call a service and log instead of raising errors."""
+    try:
+        await hass.services.async_call(domain, service, data, blocking=True)
+    except Exception:  # pylint: disable=broad-except
+        _LOGGER.exception("Error calling %s.%s for %s", domain, service, data.get("entity_id"))
+
+
+class DreaDevice(DreaEngine):
+    """Gesture engine of one knob bound to its config entry.
+
+    The engine reads the state machine, calls the services and fires the
+    events of hass, and resolves its bindings through the registries.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        device_id: str = entry.data[CONF_DEVICE_ID]
+        # None keeps the instrumentation off the hot path, toggling it reloads the entry
+        metrics = DeviceMetrics() if entry.options.get(CONF_METRICS, DEFAULT_METRICS) else None
+        super().__init__(
+            device_id,
+            hass.loop,
+            ServiceDispatcher(
+                hass.loop, partial(async_call_service, hass), DEFAULT_MAX_COMMAND_RATE, DEFAULT_MAX_IN_FLIGHT, metrics
+            ),
+            hass.states.get,
+            partial(hass.bus.async_fire, EVENT_GESTURE),
+            FeedbackPublisher(
+                hass.loop, partial(mqtt.async_publish, hass), TOPIC_FEEDBACK.format(device_id), DEFAULT_FEEDBACK_RATE
+            ),
+            metrics,
+        )
+        self.hass = hass
+        self.entry = entry
+        self.entity_id = (
+            ENTITY_LEGACY_LAST_MESSAGE
+            if device_id == LEGACY_DEVICE_ID
+            else ENTITY_LAST_MESSAGE.format(slugify(device_id))
+        )
+        self.bindings = build_binding_table(hass, entry.options)
+        self._unsubscribe_groups: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_configure(self) -> None:
+        """Apply the options of the config entry."""
+        options = self.entry.options
+        self.bindings = build_binding_table(self.hass, options)
+        self.async_apply_options(options)
+        if self._unsubscribe_groups is not None:
+            self._unsubscribe_groups()
+        # groups are expanded into their members, which are only known once the group has a state
+        self._unsubscribe_groups = async_track_state_change_event(
+            self.hass, configured_entities(options), self._async_bound_entity_changed
+        )
+
+    @callback
+    def _async_bound_entity_changed(self, event: Event) -> None:
+        """Resolve the bindings again when a bound entity appears, goes or changes its group members."""
+        old_state = event.data["old_state"]
+        new_state = event.data["new_state"]
+        if (
+            old_state is None
+            or new_state is None
+            or old_state.attributes.get(ATTR_ENTITY_ID) != new_state.attributes.get(ATTR_ENTITY_ID)
+        ):
+            self.bindings = build_binding_table(self.hass, self.entry.options)
+
+    @callback
+    def async_areas_updated(self) -> None:
+        """Resolve area bindings again after an entity or device moved."""
+        if any(binding.area_id for binding in self.bindings.values()):
+            self.bindings = build_binding_table(self.hass, self.entry.options)
+
+    @property
+    def metrics_enabled(self) -> bool:
+        """Return True if the latency instrumentation runs."""
+        return self.metrics is not None
+
+    @callback
+    def async_rotate_metrics(self, now: datetime | None = None) -> None:
+        """Start a new metrics window."""
+        if self.metrics is not None:
+            self.metrics.rotate(self.messages, self.errors)
+
+    def as_diagnostics(self) -> dict[str, Any]:
+        """Return the counters and metrics of the device."""
+        return {
+            "device_id": self.device_id,
+            "bindings": {finger_count: binding.entity_ids for finger_count, binding in self.bindings.items()},
+            **self.counters(),
+            "recognizer": self.session.recognizer.config._asdict(),
+            "session": self.session.as_attributes(),
+            "metrics": self.metrics.as_dict() if self.metrics is not None else None,
+        }
+
+    @callback
+    def async_update_state_view(self, now: datetime | None = None) -> None:
+        """Mirror the gesture session into the state machine at a low rate."""
+        session = self.session
+        if not session.dirty:
+            return
+        if not self.entry.options.get(CONF_LAST_MESSAGE_ENTITY, DEFAULT_LAST_MESSAGE_ENTITY):
+            return
+        session.dirty = False
+        attributes = session.as_attributes()
+        attributes.update(self.counters())
+        self.hass.states.async_set(self.entity_id, attributes["last_message"], attributes)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop all pending work of the device and remove its state."""
+        super().async_shutdown()
+        if self._unsubscribe_groups is not None:
+            self._unsubscribe_groups()
+            self._unsubscribe_groups = None
+        self.hass.states.async_remove(self.entity_id)
+
@@ -0,0 +1,18 @@
+"""Diagnostics support for Drea."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_DEVICE_ID, DATA_DEVICES, DOMAIN
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    device = hass.data[DOMAIN][DATA_DEVICES].get(entry.data[CONF_DEVICE_ID])
+    return {
+        "options": dict(entry.options),
+        "device": device.as_diagnostics() if device is not None else None,
+    }
@@ -0,0 +1,321 @@
+"""Latest-wins, rate-limited dispatcher for rotation service calls.
+
+Calls are queued per target, a binding of one finger count. The newest
+value of every entity of the target is kept, and the rate and in-flight
+limits hold per entity, so a slow entity only holds back its own values.
+Entities that are due together and share domain, service and data share
+one service call, and every call runs on its own.
+
+Discrete actions take a priority lane. A tap is called right away, past
+the rate and in-flight limits, after dropping the rotation values still
+pending for its entities. The final value of a rotation skips the rate
+limit but still waits for a call in flight of its entity, so an older
+value cannot overtake it.
+
+The dispatcher only needs an event loop and a coroutine function that
+makes the call, async_call_service of device.py for Home Assistant.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine
+from time import monotonic, perf_counter
+from typing import Any
+
+from .core import async_create_task, callback
+from .stats import STAGE_LIFT_TO_DISPATCH, STAGE_SERVICE_CALL, DeviceMetrics
+
+# makes one service call from domain, service and data
+ServiceCaller = Callable[[str, str, dict[str, Any]], Coroutine[Any, Any, None]]
+
+
+class TargetDispatcher:
+    """Send service calls to the entities of one target without flooding them.
+
+    Only the newest submitted value per entity is kept. The rate limit and
+    the in-flight limit hold per entity: while they hold a value back, a
+    newer value simply replaces it, and the other entities of the target
+    are sent without waiting for it.
+    """
+
+    __slots__ = (
+        "_loop",
+        "_call",
+        "_min_interval",
+        "_max_in_flight",
+        "_pending",
+        "_final",
+        "_final_since",
+        "_in_flight",
+        "_last_sent",
+        "_timer",
+        "_metrics",
+        "sent",
+        "superseded",
+        "cancelled",
+    )
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        call: ServiceCaller,
+        min_interval: float,
+        max_in_flight: int,
+        metrics: DeviceMetrics | None = None,
+    ) -> None:
+        self._loop = loop
+        self._call = call
+        self._min_interval = min_interval
+        self._max_in_flight = max_in_flight
+        self._pending: dict[str, tuple[str, str, dict[str, Any]]] = {}
+        self._final = False
+        self._final_since: float | None = None
+        # calls running and the monotonic time of the last send, per entity
+        self._in_flight: dict[str, int] = {}
+        self._last_sent: dict[str, float] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._metrics = metrics
+        self.sent = 0
+        self.superseded = 0
+        self.cancelled = 0
+
+    @callback
+    def async_configure(self, min_interval: float, max_in_flight: int) -> None:
+        """Apply new limits."""
+        self._min_interval = min_interval
+        self._max_in_flight = max_in_flight
+        self._async_maybe_send()
+
+    @callback
+    def async_submit(self, domain: str, service: str, data: dict[str, Any]) -> None:
+        """Queue a value, replacing the value of the same entity that was not sent yet."""
+        entity_id = data["entity_id"]
+        if entity_id in self._pending:
+            self.superseded += 1
+        self._pending[entity_id] = (domain, service, data)
+        self._async_maybe_send()
+
+    @callback
+    def async_flush(self, since: float | None = None) -> None:
+        """Send the pending values as soon as the call slots of their entities are free.
+
+        since is the perf_counter of the finger lift, the time until the
+        last of the values is sent is recorded.
+        """
+        if not self._pending:
+            return
+        self._final = True
+        self._final_since = since
+        self._async_maybe_send()
+
+    @callback
+    def async_discard(self, entity_ids: list[str]) -> None:
+        """Drop the pending values of some entities."""
+        pending = self._pending
+        for entity_id in entity_ids:
+            if pending.pop(entity_id, None) is not None:
+                self.cancelled += 1
+        if not pending:
+            self._final = False
+            self._async_cancel_timer()
+
+    @callback
+    def async_cancel(self) -> None:
+        """Drop the pending values and stop the timer."""
+        self._pending = {}
+        self._final = False
+        self._async_cancel_timer()
+
+    @callback
+    def _async_cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @callback
+    def _async_timer_fired(self) -> None:
+        self._timer = None
+        self._async_maybe_send()
+
+    @callback
+    def _async_maybe_send(self) -> None:
+        pending = self._pending
+        if not pending:
+            return
+        now = monotonic()
+        final = self._final
+        min_interval = self._min_interval
+        max_in_flight = self._max_in_flight
+        in_flight = self._in_flight
+        last_sent = self._last_sent
+        ready: dict[str, tuple[str, str, dict[str, Any]]] = {}
+        wait: float | None = None
+        for entity_id, call in pending.items():
+            if in_flight.get(entity_id, 0) >= max_in_flight:
+                # sent when a call of the entity returns
+                continue
+            entity_wait = last_sent.get(entity_id, now - min_interval) + min_interval - now
+            if entity_wait > 0 and not final:
+                if wait is None or entity_wait < wait:
+                    wait = entity_wait
+                continue
+            ready[entity_id] = call
+
+        if ready:
+            for entity_id in ready:
+                del pending[entity_id]
+                last_sent[entity_id] = now
+                in_flight[entity_id] = in_flight.get(entity_id, 0) + 1
+            for domain, service, data in merge_calls(ready):
+                self.sent += 1
+                async_create_task(self._loop, self._async_call(domain, service, data))
+            if not pending:
+                if final and self._final_since is not None and self._metrics is not None:
+                    self._metrics.record(STAGE_LIFT_TO_DISPATCH, perf_counter() - self._final_since)
+                self._final = False
+                self._final_since = None
+
+        timer = self._timer
+        if wait is None:
+            self._async_cancel_timer()
+        elif timer is None or timer.when() > self._loop.time() + wait:
+            if timer is not None:
+                timer.cancel()
+            self._timer = self._loop.call_later(wait, self._async_timer_fired)
+
+    async def _async_call(self, domain: str, service: str, data: dict[str, Any]) -> None:
+        start = perf_counter()
+        try:
+            await self._call(domain, service, data)
+            if self._metrics is not None:
+                self._metrics.record(STAGE_SERVICE_CALL, perf_counter() - start)
+        finally:
+            entity_ids = data["entity_id"]
+            in_flight = self._in_flight
+            for entity_id in [entity_ids] if isinstance(entity_ids, str) else entity_ids:
+                if in_flight[entity_id] > 1:
+                    in_flight[entity_id] -= 1
+                else:
+                    del in_flight[entity_id]
+            self._async_maybe_send()
+
+
+def merge_calls(pending: dict[str, tuple[str, str, dict[str, Any]]]) -> list[tuple[str, str, dict[str, Any]]]:
+    """Merge the calls of entities with the same domain, service and data."""
+    if len(pending) == 1:
+        return list(pending.values())
+    merged: dict[tuple, tuple[str, str, dict[str, Any]]] = {}
+    for entity_id, (domain, service, data) in pending.items():
+        key = (
+            domain,
+            service,
+            tuple(
+                (name, tuple(value) if isinstance(value, list) else value)
+                for name, value in data.items()
+                if name != "entity_id"
+            ),
+        )
+        call = merged.get(key)
+        if call is None:
+            merged[key] = (domain, service, {**data, "entity_id": [entity_id]})
+        else:
+            call[2]["entity_id"].append(entity_id)
+    calls = []
+    for domain, service, data in merged.values():
+        if len(data["entity_id"]) == 1:
+            data["entity_id"] = data["entity_id"][0]
+        calls.append((domain, service, data))
+    return calls
+
+
+def rate_interval(max_rate: float) -> float:
+    """Return the seconds between two sends of a rate, 0 or less removes the limit."""
+    return 1.0 / max_rate if max_rate > 0 else 0.0
+
+
+class ServiceDispatcher:
+    """Route service calls to one TargetDispatcher per target."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        call: ServiceCaller,
+        max_rate: float,
+        max_in_flight: int,
+        metrics: DeviceMetrics | None = None,
+    ) -> None:
+        self._loop = loop
+        self._call = call
+        self._min_interval = rate_interval(max_rate)
+        self._max_in_flight = max(1, max_in_flight)
+        self._metrics = metrics
+        self._targets: dict[str, TargetDispatcher] = {}
+        # discrete actions sent through the priority lane
+        self.priority = 0
+
+    @callback
+    def async_configure(self, max_rate: float, max_in_flight: int) -> None:
+        """Apply new limits to all targets, a rate of 0 removes the rate limit."""
+        self._min_interval = rate_interval(max_rate)
+        self._max_in_flight = max(1, max_in_flight)
+        for target_dispatcher in self._targets.values():
+            target_dispatcher.async_configure(self._min_interval, self._max_in_flight)
+
+    @callback
+    def async_submit(self, domain: str, service: str, data: dict[str, Any], target: str | None = None) -> None:
+        """Submit a service call for the entity in data["entity_id"].
+
+        The target defaults to the entity itself.
+        """
+        if target is None:
+            target = data["entity_id"]
+        target_dispatcher = self._targets.get(target)
+        if target_dispatcher is None:
+            target_dispatcher = self._targets[target] = TargetDispatcher(
+                self._loop, self._call, self._min_interval, self._max_in_flight, self._metrics
+            )
+        target_dispatcher.async_submit(domain, service, data)
+
+    @property
+    def sent(self) -> int:
+        """Return the number of rotation service calls of all targets."""
+        return sum(target_dispatcher.sent for target_dispatcher in self._targets.values())
+
+    @property
+    def superseded(self) -> int:
+        """Return the number of values replaced before they were sent."""
+        return sum(target_dispatcher.superseded for target_dispatcher in self._targets.values())
+
+    @property
+    def cancelled(self) -> int:
+        """Return the number of values dropped for a priority call."""
+        return sum(target_dispatcher.cancelled for target_dispatcher in self._targets.values())
+
+    @callback
+    def async_flush(self, target: str, since: float | None = None) -> None:
+        """Make sure the last values for a target are sent, since is the perf_counter of the lift."""
+        target_dispatcher = self._targets.get(target)
+        if target_dispatcher is not None:
+            target_dispatcher.async_flush(since)
+
+    @callback
+    def async_submit_priority(
+        self, domain: str, service: str, data: dict[str, Any], since: float | None = None
+    ) -> None:
+        """Call a service right away, dropping the rotation values pending for its entities."""
+        entity_ids = data["entity_id"]
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        for target_dispatcher in self._targets.values():
+            target_dispatcher.async_discard(entity_ids)
+        if since is not None and self._metrics is not None:
+            self._metrics.record(STAGE_LIFT_TO_DISPATCH, perf_counter() - since)
+        self.priority += 1
+        async_create_task(self._loop, self._call(domain, service, data))
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Drop all pending values."""
+        for target_dispatcher in self._targets.values():
+            target_dispatcher.async_cancel()
+        self._targets.clear()
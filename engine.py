@@ -0,0 +1,503 @@
+"""Gesture engine of one DREA knob.
+
+The engine queues the samples of a knob, runs them through the gesture
+recognizer and the rotation filter, and resolves rotations and taps into
+service calls with the transforms of its bindings. It does not import
+Home Assistant: the states it reads at touch-down, the dispatcher the
+service calls go to, the callback of the gesture events and the feedback
+publisher are handed in. DreaDevice adapts it to a config entry, runner.py runs it
+against a plain MQTT broker.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Mapping
+import logging
+from time import perf_counter, time
+from types import MappingProxyType
+from typing import Any
+
+from .const import (
+    CONF_DEAD_ZONE,
+    CONF_DEVICE_ID,
+    CONF_DOUBLE_TAP_WINDOW,
+    CONF_FEEDBACK_RATE,
+    CONF_FINGER_HYSTERESIS,
+    CONF_FLING_VELOCITY,
+    CONF_LONG_PRESS_DURATION,
+    CONF_MAX_COMMAND_RATE,
+    CONF_MAX_IN_FLIGHT,
+    CONF_MAX_SAMPLE_AGE,
+    CONF_ROTATION_THRESHOLD,
+    CONF_SMOOTHING,
+    CONF_SMOOTHING_BETA,
+    CONF_SMOOTHING_MIN_CUTOFF,
+    CONF_TAP_MAX_DURATION,
+    CONF_TAP_MIN_DURATION,
+    DEFAULT_DEAD_ZONE,
+    DEFAULT_DOUBLE_TAP_WINDOW,
+    DEFAULT_FEEDBACK_RATE,
+    DEFAULT_FINGER_HYSTERESIS,
+    DEFAULT_FLING_VELOCITY,
+    DEFAULT_LONG_PRESS_DURATION,
+    DEFAULT_MAX_COMMAND_RATE,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_SAMPLE_AGE,
+    DEFAULT_ROTATION_THRESHOLD,
+    DEFAULT_SMOOTHING,
+    DEFAULT_SMOOTHING_BETA,
+    DEFAULT_SMOOTHING_MIN_CUTOFF,
+    DEFAULT_TAP_MAX_DURATION,
+    DEFAULT_TAP_MIN_DURATION,
+    LEGACY_DEVICE_ID,
+    MAX_DEVICE_LATENCY,
+    MAX_QUEUED_SAMPLES,
+    TOPIC_LEGACY,
+)
+from .binding import Binding, BindingTarget
+from .core import STATE_CLOSED, STATE_OFF, STATE_ON, STATE_UNAVAILABLE, STATE_UNKNOWN, State, callback
+from .dispatcher import ServiceDispatcher
+from .feedback import FeedbackPublisher
+from .gesture import GestureSession
+from .inbox import SampleInbox
+from .parser import DreaSample, decode_payload
+from .recognizer import (
+    GESTURE_DOUBLE_TAP,
+    GESTURE_FLING,
+    GESTURE_LONG_PRESS,
+    GESTURE_RELEASE,
+    GESTURE_ROTATE,
+    GESTURE_TAP,
+    GESTURE_TAP_PENDING,
+    GESTURE_TOUCH,
+    RecognizerConfig,
+)
+from .smoothing import SMOOTHING_NONE, RotationFilter
+from .stats import (
+    STAGE_DEVICE_TO_HA,
+    STAGE_DISPATCH,
+    STAGE_GESTURE,
+    STAGE_HANDLER,
+    STAGE_PARSE,
+    STAGE_QUEUE,
+    STAGE_TRANSFORM,
+    DeviceMetrics,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# states that count as off when a tap toggles several entities
+INACTIVE_STATES = (STATE_OFF, STATE_CLOSED, STATE_UNAVAILABLE, STATE_UNKNOWN)
+
+# receives the data of a drea_gesture event
+GestureCallback = Callable[[dict[str, Any]], None]
+
+
+def topic_device_id(topic: str) -> str:
+    """Return the device id of a message on drea/<device id>/data or the legacy topic."""
+    return LEGACY_DEVICE_ID if topic == TOPIC_LEGACY else topic.split("/", 2)[1]
+
+
+@callback
+def async_toggle_entity(
+    dispatcher: ServiceDispatcher, target: BindingTarget, last_state: str | None, since: float | None = None
+) -> None:
+    """Call the tap action of one entity for its current state."""
+    if target.tap is None:
+        return
+    service = target.tap(last_state)
+    if service is not None:
+        dispatcher.async_submit_priority(target.domain, service, {"entity_id": target.entity_id}, since)
+
+
+@callback
+def async_toggle_binding(
+    dispatcher: ServiceDispatcher,
+    binding: Binding,
+    states: Mapping[str, State | None],
+    since: float | None = None,
+) -> None:
+    """Toggle the entities of a binding with one call per domain and service.
+
+    Like a group, several entities are all turned off if any of them is on.
+    The calls take the priority lane of the dispatcher, since is the
+    perf_counter of the finger lift.
+    """
+    targets = binding.targets
+    if len(targets) == 1:
+        state = states.get(targets[0].entity_id)
+        async_toggle_entity(dispatcher, targets[0], state.state if state is not None else None, since)
+        return
+    any_on = any(
+        state is not None and state.state not in INACTIVE_STATES
+        for state in (states.get(target.entity_id) for target in targets)
+    )
+    calls: dict[tuple[str, str], list[str]] = {}
+    for target in targets:
+        if target.tap is None:
+            continue
+        service = target.tap(STATE_ON if any_on else STATE_OFF)
+        if service is not None:
+            calls.setdefault((target.domain, service), []).append(target.entity_id)
+    for (domain, service), entity_ids in calls.items():
+        dispatcher.async_submit_priority(domain, service, {"entity_id": entity_ids}, since)
+
+
+class DreaEngine:
+    """Gesture session, bindings and counters of one knob."""
+
+    def __init__(
+        self,
+        device_id: str,
+        loop: asyncio.AbstractEventLoop,
+        dispatcher: ServiceDispatcher,
+        get_state: Callable[[str], State | None],
+        fire_gesture: GestureCallback,
+        feedback: FeedbackPublisher | None = None,
+        metrics: DeviceMetrics | None = None,
+    ) -> None:
+        self.device_id = device_id
+        self.loop = loop
+        self.session = GestureSession()
+        self.inbox = SampleInbox(MAX_QUEUED_SAMPLES, DEFAULT_MAX_SAMPLE_AGE)
+        self.bindings: Mapping[int, Binding] = MappingProxyType({})
+        # None keeps the instrumentation off the hot path
+        self.metrics = metrics
+        self.dispatcher = dispatcher
+        self.feedback = feedback
+        self._get_state = get_state
+        self._fire_gesture = fire_gesture
+        # perf_counter of receiving the batch being processed, only kept with metrics on
+        self.received: float | None = None
+        self.messages = 0
+        self.samples = 0
+        self.malformed = 0
+        self.errors = 0
+        self.taps = 0
+        self.rotations = 0
+        self.double_taps = 0
+        self.long_presses = 0
+        self.flings = 0
+        # rotations that did not change the value the target can resolve
+        self.unchanged = 0
+
+    @callback
+    def async_apply_options(self, options: Mapping[str, Any]) -> None:
+        """Apply the gesture, queue and rate options, the bindings are resolved by the caller.
+
+        A rotation in progress stops, its transforms were prepared for the old bindings.
+        """
+        session = self.session
+        session.transforms = {}
+        session.pending_rotation = None
+        session.recognizer.config = build_recognizer_config(options)
+        session.rotation_filter = build_rotation_filter(options)
+        self.inbox.max_age = int(options.get(CONF_MAX_SAMPLE_AGE, DEFAULT_MAX_SAMPLE_AGE))
+        self.dispatcher.async_configure(
+            options.get(CONF_MAX_COMMAND_RATE, DEFAULT_MAX_COMMAND_RATE),
+            int(options.get(CONF_MAX_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT)),
+        )
+        if self.feedback is not None:
+            self.feedback.async_configure(float(options.get(CONF_FEEDBACK_RATE, DEFAULT_FEEDBACK_RATE)))
+
+    @callback
+    def handle_message(self, payload: str | bytes) -> None:
+        """Queue the samples of a text or binary MQTT payload.
+
+        The queue is processed on the next turn of the event loop, so a burst
+        of messages that arrived together is handled as one batch.
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            start = perf_counter()
+        batch = decode_payload(payload)
+        self.messages += 1
+        self.samples += len(batch)
+        if batch.malformed:
+            self.malformed += batch.malformed
+        inbox = self.inbox
+        if metrics is not None and not inbox:
+            inbox.waiting_since = start
+        received = time() * 1000
+        sample = None
+        for sample in batch:
+            inbox.put(sample, received)
+        if inbox and not inbox.scheduled:
+            inbox.scheduled = True
+            self.loop.call_soon(self.async_process_samples)
+
+        if metrics is not None:
+            metrics.record(STAGE_PARSE, perf_counter() - start)
+            if sample is not None:
+                # only meaningful when the knob sends epoch milliseconds
+                device_latency = (received - sample.timestamp) / 1000
+                if 0 <= device_latency < MAX_DEVICE_LATENCY:
+                    metrics.record(STAGE_DEVICE_TO_HA, device_latency)
+
+    @callback
+    def async_process_samples(self) -> None:
+        """Run the queued samples through the gesture session."""
+        inbox = self.inbox
+        inbox.scheduled = False
+        if not inbox:
+            return
+        metrics = self.metrics
+        if metrics is not None:
+            start = perf_counter()
+            metrics.record(STAGE_QUEUE, start - inbox.waiting_since)
+            self.received = inbox.waiting_since
+
+        samples = inbox.samples
+        while samples:
+            self.handle_sample(samples.popleft())
+        # only the newest rotation of a batch is worth a service call
+        self.async_submit_rotation()
+        self.session.dirty = True
+
+        if metrics is not None:
+            self.received = None
+            end = perf_counter()
+            metrics.record(STAGE_GESTURE, end - start)
+            # from receiving the oldest sample of the batch until it was handled
+            metrics.record(STAGE_HANDLER, end - inbox.waiting_since)
+
+    @callback
+    def async_submit_rotation(self) -> None:
+        """Compute and dispatch the pending rotation of the session."""
+        session = self.session
+        pending_rotation = session.pending_rotation
+        if pending_rotation is None:
+            return
+        session.pending_rotation = None
+        finger_count, rotation = pending_rotation
+        transforms = session.transforms.get(finger_count)
+        if not transforms:
+            return
+        binding = self.bindings.get(finger_count)
+        if binding is None:
+            # the bindings changed since touch-down
+            return
+        key = binding.key
+        dispatcher = self.dispatcher
+        metrics = self.metrics
+        changed = None
+        try:
+            if metrics is None:
+                for target, transform in transforms:
+                    output_data = transform(rotation)
+                    if output_data is None:
+                        # the target cannot resolve the change
+                        self.unchanged += 1
+                    else:
+                        dispatcher.async_submit(target.domain, target.service, output_data, key)
+                        changed = transform
+            else:
+                for target, transform in transforms:
+                    start = perf_counter()
+                    output_data = transform(rotation)
+                    transformed = perf_counter()
+                    metrics.record(STAGE_TRANSFORM, transformed - start)
+                    if output_data is None:
+                        self.unchanged += 1
+                        continue
+                    dispatcher.async_submit(target.domain, target.service, output_data, key)
+                    metrics.record(STAGE_DISPATCH, perf_counter() - transformed)
+                    changed = transform
+        except Exception:  # pylint: disable=broad-except
+            # a transform that fails once would fail for every sample of the gesture
+            self.errors += 1
+            _LOGGER.debug("Resetting gesture of %s after rotation %s", self.device_id, rotation, exc_info=True)
+            session.reset()
+            return
+        feedback = self.feedback
+        if changed is not None and feedback is not None and feedback.enabled:
+            # the level of the last changed entity stands for the whole binding
+            feedback.async_update(finger_count, binding.attribute, changed.level())
+
+    @callback
+    def handle_sample(self, current_message: DreaSample) -> None:
+        """Run one sample through the gesture recognizer."""
+        session = self.session
+        recognizer = session.recognizer
+        try:
+            gesture = recognizer.push(current_message)
+            if gesture == GESTURE_ROTATE:
+                if recognizer.confirmed_tap:
+                    # the tap goes out before the rotation that ruled out a double tap
+                    self.async_confirmed_tap()
+                rotation_filter = session.rotation_filter
+                if rotation_filter is None:
+                    session.pending_rotation = (recognizer.finger_count, recognizer.rotation)
+                else:
+                    rotation = rotation_filter.update(current_message.timestamp, recognizer.rotation)
+                    if rotation is not None:
+                        session.pending_rotation = (recognizer.finger_count, rotation)
+            elif gesture is not None:
+                self.async_handle_gesture(gesture)
+        except Exception:  # pylint: disable=broad-except
+            self.errors += 1
+            _LOGGER.debug("Resetting gesture of %s after %s", self.device_id, current_message, exc_info=True)
+            session.reset()
+
+        session.last_message = current_message
+
+    @callback
+    def async_handle_gesture(self, gesture: str) -> None:
+        """Act on a gesture other than a rotation sample."""
+        session = self.session
+        recognizer = session.recognizer
+        if recognizer.confirmed_tap:
+            self.async_confirmed_tap()
+
+        if gesture == GESTURE_TOUCH:
+            session.pending_rotation = None
+            if session.rotation_filter is not None:
+                session.rotation_filter.reset()
+            get_state = self._get_state
+            states = session.rotation_state_dict = {
+                target.entity_id: get_state(target.entity_id)
+                for binding in self.bindings.values()
+                for target in binding.targets
+            }
+            # resolve base values and limits once per entity, rotation samples only scale and clamp
+            transforms = session.transforms = {}
+            for finger_count, binding in self.bindings.items():
+                prepared = []
+                for target in binding.targets:
+                    if target.prepare_transform is not None:
+                        transform = target.prepare_transform(target.entity_id, states[target.entity_id])
+                        if transform is not None:
+                            prepared.append((target, transform))
+                transforms[finger_count] = tuple(prepared)
+        elif gesture == GESTURE_RELEASE or gesture == GESTURE_FLING:
+            if recognizer.rotated and session.rotation_filter is not None:
+                # the smoothed value lags behind, end exactly where the hand stopped
+                rotation = session.rotation_filter.settle(recognizer.rotation)
+                if rotation is not None:
+                    session.pending_rotation = (recognizer.finger_count, rotation)
+            self.async_submit_rotation()
+            if recognizer.rotated:
+                self.rotations += 1
+                # the fingers lifted, the final rotation value must reach the target
+                binding = self.bindings.get(recognizer.finger_count)
+                if binding is not None:
+                    self.dispatcher.async_flush(binding.key, self.received)
+            if gesture == GESTURE_FLING:
+                self.flings += 1
+                self.async_fire_gesture(gesture, recognizer.finger_count)
+        elif gesture == GESTURE_TAP:
+            self.async_tap(recognizer.finger_count, session.rotation_state_dict)
+        elif gesture == GESTURE_TAP_PENDING:
+            session.cancel_tap_timer()
+            session.tap_timer = self.loop.call_later(
+                recognizer.config.double_tap_window / 1000, self.async_expire_tap
+            )
+        elif gesture == GESTURE_DOUBLE_TAP:
+            session.cancel_tap_timer()
+            self.double_taps += 1
+            self.async_fire_gesture(gesture, recognizer.finger_count)
+        elif gesture == GESTURE_LONG_PRESS:
+            self.long_presses += 1
+            self.async_fire_gesture(gesture, recognizer.finger_count)
+
+    @callback
+    def async_confirmed_tap(self) -> None:
+        """Handle a deferred tap once the following gesture was no second tap.
+
+        The entities are toggled for their states at the touch-down of that
+        gesture, before it changed anything.
+        """
+        recognizer = self.session.recognizer
+        finger_count = recognizer.confirmed_tap
+        recognizer.confirmed_tap = 0
+        self.async_tap(finger_count, self.session.rotation_state_dict)
+
+    @callback
+    def async_expire_tap(self) -> None:
+        """Handle a deferred tap once no second tap followed it."""
+        self.session.tap_timer = None
+        finger_count = self.session.recognizer.expire_pending_tap()
+        if finger_count:
+            self.async_tap(finger_count)
+
+    @callback
+    def async_tap(self, finger_count: int, states: Mapping[str, State | None] | None = None) -> None:
+        """Toggle the entities bound to finger_count, states None uses the current states."""
+        self.taps += 1
+        binding = self.bindings.get(finger_count)
+        if binding is not None:
+            if states is None:
+                states = {target.entity_id: self._get_state(target.entity_id) for target in binding.targets}
+            # a deferred tap is handled outside a batch and has no lift time
+            async_toggle_binding(self.dispatcher, binding, states, self.received)
+        self.async_fire_gesture(GESTURE_TAP, finger_count)
+
+    @callback
+    def async_fire_gesture(self, gesture: str, finger_count: int) -> None:
+        """Hand a gesture to the gesture callback, the data of a drea_gesture event."""
+        binding = self.bindings.get(finger_count)
+        self._fire_gesture(
+            {
+                CONF_DEVICE_ID: self.device_id,
+                "gesture": gesture,
+                "finger_count": finger_count,
+                "entity_id": binding.entity_ids if binding is not None else None,
+            }
+        )
+
+    def counters(self) -> dict[str, int]:
+        """Return the message, drop and gesture counters."""
+        inbox = self.inbox
+        return {
+            "messages": self.messages,
+            "samples": self.samples,
+            "malformed": self.malformed,
+            "stale": inbox.stale,
+            "out_of_order": inbox.out_of_order,
+            "overflow": inbox.overflow,
+            "errors": self.errors,
+            "taps": self.taps,
+            "rotations": self.rotations,
+            "double_taps": self.double_taps,
+            "long_presses": self.long_presses,
+            "flings": self.flings,
+            "unchanged": self.unchanged,
+            "feedback": self.feedback.sent if self.feedback is not None else 0,
+            "priority": self.dispatcher.priority,
+        }
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop all pending work of the knob."""
+        self.session.cancel_tap_timer()
+        self.inbox.clear()
+        self.dispatcher.async_shutdown()
+        if self.feedback is not None:
+            self.feedback.async_cancel()
+
+
+def build_recognizer_config(options: Mapping[str, Any]) -> RecognizerConfig:
+    """Read the gesture thresholds of a config entry."""
+    return RecognizerConfig(
+        tap_min_duration=int(options.get(CONF_TAP_MIN_DURATION, DEFAULT_TAP_MIN_DURATION)),
+        tap_max_duration=int(options.get(CONF_TAP_MAX_DURATION, DEFAULT_TAP_MAX_DURATION)),
+        rotation_threshold=float(options.get(CONF_ROTATION_THRESHOLD, DEFAULT_ROTATION_THRESHOLD)),
+        finger_hysteresis=int(options.get(CONF_FINGER_HYSTERESIS, DEFAULT_FINGER_HYSTERESIS)),
+        double_tap_window=int(options.get(CONF_DOUBLE_TAP_WINDOW, DEFAULT_DOUBLE_TAP_WINDOW)),
+        long_press_duration=int(options.get(CONF_LONG_PRESS_DURATION, DEFAULT_LONG_PRESS_DURATION)),
+        fling_velocity=float(options.get(CONF_FLING_VELOCITY, DEFAULT_FLING_VELOCITY)),
+    )
+
+
+def build_rotation_filter(options: Mapping[str, Any]) -> RotationFilter | None:
+    """Create the rotation filter of a config entry, None if it would pass everything."""
+    smoothing = options.get(CONF_SMOOTHING, DEFAULT_SMOOTHING)
+    dead_zone = float(options.get(CONF_DEAD_ZONE, DEFAULT_DEAD_ZONE))
+    if smoothing == SMOOTHING_NONE and not dead_zone:
+        return None
+    return RotationFilter(
+        smoothing,
+        float(options.get(CONF_SMOOTHING_MIN_CUTOFF, DEFAULT_SMOOTHING_MIN_CUTOFF)),
+        float(options.get(CONF_SMOOTHING_BETA, DEFAULT_SMOOTHING_BETA)),
+        dead_zone,
+    )
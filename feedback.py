@@ -0,0 +1,109 @@
+"""Feedback of the controlled value to the knob.
+
+While a rotation changes an attribute, the knob gets the new value on
+drea/<device id>/feedback as one text line::
+
+    finger_count,attribute,level
+
+with the level as a whole percentage of the range of the attribute, for
+example ``2,brightness,42``. Messages are published with QoS 0, at most
+max_rate per second, and only the newest level is kept while the rate
+limit holds them back. The publisher is handed the coroutine function
+that publishes, mqtt.async_publish in Home Assistant and the paho client
+in runner.py.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine
+from time import monotonic
+from typing import Any
+
+from .core import async_create_task, callback
+
+# publishes a payload on a topic
+PublishCallback = Callable[[str, str], Coroutine[Any, Any, None]]
+
+
+class FeedbackPublisher:
+    """Rate-limited, latest-wins feedback publisher of one knob."""
+
+    __slots__ = (
+        "_loop",
+        "topic",
+        "publish",
+        "_min_interval",
+        "_pending",
+        "_last_payload",
+        "_last_sent",
+        "_timer",
+        "sent",
+        "superseded",
+    )
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, publish: PublishCallback, topic: str, max_rate: float
+    ) -> None:
+        self._loop = loop
+        self.topic = topic
+        self.publish = publish
+        self._min_interval = 0.0
+        self._pending: str | None = None
+        self._last_payload: str | None = None
+        self._last_sent = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self.sent = 0
+        self.superseded = 0
+        self.async_configure(max_rate)
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if feedback is published."""
+        return self._min_interval > 0
+
+    @callback
+    def async_configure(self, max_rate: float) -> None:
+        """Apply a new rate limit, 0 disables the feedback."""
+        self._min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        if not self._min_interval:
+            self.async_cancel()
+
+    @callback
+    def async_update(self, finger_count: int, attribute: str, level: float | None) -> None:
+        """Publish the level of the attribute bound to finger_count."""
+        if level is None or not self._min_interval:
+            return
+        payload = f"{finger_count},{attribute},{round(level)}"
+        if payload == self._last_payload:
+            self._pending = None
+            return
+        if self._pending is not None:
+            self.superseded += 1
+        self._pending = payload
+        if self._timer is not None:
+            return
+        wait = self._last_sent + self._min_interval - monotonic()
+        if wait > 0:
+            self._timer = self._loop.call_later(wait, self._async_send)
+        else:
+            self._async_send()
+
+    @callback
+    def async_cancel(self) -> None:
+        """Drop the pending level and stop the timer."""
+        self._pending = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @callback
+    def _async_send(self) -> None:
+        self._timer = None
+        payload = self._pending
+        if payload is None:
+            return
+        self._pending = None
+        self._last_payload = payload
+        self._last_sent = monotonic()
+        self.sent += 1
+        async_create_task(self._loop, self.publish(self.topic, payload))
@@ -0,0 +1,80 @@
+"""In-memory gesture session of a DREA device."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from .binding import BindingTarget
+from .core import State
+from .parser import DreaSample
+from .recognizer import GestureRecognizer, RecognizerConfig
+from .smoothing import RotationFilter
+from .transforms import Transform
+
+
+class GestureSession:
+    """Gesture state owned by one DREA device.
+
+    The session lives for the lifetime of the integration and is only ever
+    touched from the MQTT message handler, so it needs no locking.
+    """
+
+    __slots__ = (
+        "last_message",
+        "recognizer",
+        "rotation_state_dict",
+        "transforms",
+        "rotation_filter",
+        "pending_rotation",
+        "tap_timer",
+        "dirty",
+    )
+
+    def __init__(self, config: RecognizerConfig | None = None) -> None:
+        self.last_message: DreaSample | None = None
+        self.recognizer = GestureRecognizer(config)
+        # snapshot of the bound entities at touch-down, keyed by entity id
+        self.rotation_state_dict: dict[str, State | None] = {}
+        self.transforms: dict[int, tuple[tuple[BindingTarget, Transform], ...]] = {}
+        # None when neither smoothing nor a dead zone is configured
+        self.rotation_filter: RotationFilter | None = None
+        self.pending_rotation: tuple[int, float] | None = None
+        # ends the double tap window of a deferred tap
+        self.tap_timer: asyncio.TimerHandle | None = None
+        self.dirty = False
+
+    def reset(self) -> None:
+        """Forget the current gesture."""
+        self.recognizer.reset()
+        self.rotation_state_dict = {}
+        self.transforms = {}
+        self.pending_rotation = None
+        self.cancel_tap_timer()
+
+    def cancel_tap_timer(self) -> None:
+        """Stop waiting for the end of a double tap window."""
+        if self.tap_timer is not None:
+            self.tap_timer.cancel()
+            self.tap_timer = None
+
+    def last_message_text(self) -> str:
+        """Return the last sample in the text payload format."""
+        message = self.last_message
+        if message is None:
+            return "No messages"
+        return ",".join(map(str, message))
+
+    def as_attributes(self) -> dict[str, Any]:
+        """Return a JSON friendly snapshot for the state view."""
+        recognizer = self.recognizer
+        first_sample = recognizer.first_sample
+        return {
+            "last_message": self.last_message_text(),
+            "finger_count": recognizer.finger_count,
+            "finger_count_count": recognizer.votes,
+            "first_message_with_finger": first_sample._asdict() if first_sample is not None else None,
+            "rotation": round(recognizer.rotation, 2),
+            "rotation_entities": [
+                entity_id for entity_id, state in self.rotation_state_dict.items() if state is not None
+            ],
+        }
@@ -0,0 +1,181 @@
+"""Registry of the attributes a rotation can control.
+
+Each (domain, attribute) pair has one AttributeHandler. It names the
+service the rotation calls, checks whether an entity supports the
+attribute, and prepares the transform from the state snapshot taken at
+touch-down. It also names the service a tap calls. The binding table
+resolves the handlers once per config change, so the message path does
+not look them up. The catalog and the config flow list the attributes of
+an entity from the same registry.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import NamedTuple
+
+from .core import ATTR_SUPPORTED_FEATURES, STATE_OFF, STATE_ON, STATE_OPEN, STATE_OPENING, State
+from .transforms import (
+    PrepareTransform,
+    prepare_brightness,
+    prepare_climate_temperature,
+    prepare_color_temp,
+    prepare_cover_position,
+    prepare_fan_percentage,
+    prepare_hs_color,
+    prepare_hs_sat,
+    prepare_media_player_volume,
+    prepare_media_position,
+    prepare_number_value,
+    prepare_rgbw_color,
+)
+
+# supported_features bits of the entity features of Home Assistant, kept here
+# so the engine does not import the climate, cover, fan and media_player components
+CLIMATE_TARGET_TEMPERATURE = 1
+COVER_SET_POSITION = 4
+FAN_SET_SPEED = 1
+MEDIA_PLAYER_SEEK = 2
+MEDIA_PLAYER_VOLUME_SET = 4
+
+# returns the service a tap calls for the state of an entity, a group passes on or off
+TapAction = Callable[[str | None], str | None]
+
+
+class AttributeHandler(NamedTuple):
+    """Rotation and tap control of one attribute of a domain."""
+
+    domain: str
+    attribute: str
+    service: str
+    supports: Callable[[State], bool]
+    prepare: PrepareTransform
+    tap: TapAction | None
+
+
+_HANDLERS: dict[tuple[str, str], AttributeHandler] = {}
+_DOMAIN_HANDLERS: dict[str, list[AttributeHandler]] = {}
+
+
+def register_handler(handler: AttributeHandler) -> None:
+    """Add or replace the handler of a domain and attribute."""
+    key = (handler.domain, handler.attribute)
+    domain_handlers = _DOMAIN_HANDLERS.setdefault(handler.domain, [])
+    previous = _HANDLERS.get(key)
+    if previous is not None:
+        domain_handlers[domain_handlers.index(previous)] = handler
+    else:
+        domain_handlers.append(handler)
+    _HANDLERS[key] = handler
+
+
+def get_handler(domain: str, attribute: str | None) -> AttributeHandler | None:
+    """Return the handler of a domain and attribute."""
+    return _HANDLERS.get((domain, attribute))  # type: ignore[arg-type]
+
+
+def get_tap_action(domain: str, attribute: str | None) -> TapAction | None:
+    """Return the tap action of an attribute, or of the domain if the attribute has no handler."""
+    handler = _HANDLERS.get((domain, attribute))  # type: ignore[arg-type]
+    if handler is None:
+        domain_handlers = _DOMAIN_HANDLERS.get(domain)
+        if not domain_handlers:
+            return None
+        handler = domain_handlers[0]
+    return handler.tap
+
+
+def supported_domains() -> list[str]:
+    """Return the domains with at least one handler."""
+    return list(_DOMAIN_HANDLERS)
+
+
+def entity_attributes(state: State) -> tuple[str, ...]:
+    """Return the attributes a rotation can control on an entity."""
+    return tuple(
+        handler.attribute for handler in _DOMAIN_HANDLERS.get(state.domain, ()) if handler.supports(state)
+    )
+
+
+def _color_modes(state: State) -> tuple[str, ...]:
+    return state.attributes.get("supported_color_modes") or ()
+
+
+def _has_feature(state: State, attribute: str, feature: int) -> bool:
+    """Return True if the entity reports the attribute or the supported feature."""
+    return attribute in state.attributes or bool((state.attributes.get(ATTR_SUPPORTED_FEATURES) or 0) & feature)
+
+
+def _always(state: State) -> bool:
+    return True
+
+
+def _tap_on_off(state: str | None) -> str | None:
+    if state == STATE_OFF:
+        return "turn_on"
+    if state == STATE_ON:
+        return "turn_off"
+    return None
+
+
+def _tap_climate(state: str | None) -> str | None:
+    return "turn_on" if state == STATE_OFF else "turn_off"
+
+
+def _tap_media_player(state: str | None) -> str | None:
+    return "media_play_pause"
+
+
+def _tap_cover(state: str | None) -> str | None:
+    return "close_cover" if state in (STATE_ON, STATE_OPEN, STATE_OPENING) else "open_cover"
+
+
+for _handler in (
+    AttributeHandler("light", "brightness", "turn_on", _always, prepare_brightness, _tap_on_off),
+    AttributeHandler(
+        "light", "color", "turn_on",
+        lambda state: any(mode in _color_modes(state) for mode in ("hs", "xy", "rgb")),
+        prepare_hs_color, _tap_on_off,
+    ),
+    AttributeHandler(
+        "light", "saturation", "turn_on",
+        lambda state: any(mode in _color_modes(state) for mode in ("hs", "xy", "rgb")),
+        prepare_hs_sat, _tap_on_off,
+    ),
+    AttributeHandler(
+        "light", "color_temp", "turn_on", lambda state: "color_temp" in _color_modes(state),
+        prepare_color_temp, _tap_on_off,
+    ),
+    AttributeHandler(
+        "light", "rgbw_color", "turn_on", lambda state: "rgbw" in _color_modes(state),
+        prepare_rgbw_color, _tap_on_off,
+    ),
+    AttributeHandler(
+        "media_player", "volume_level", "volume_set",
+        # volume_level is only reported while the player is on
+        lambda state: _has_feature(state, "volume_level", MEDIA_PLAYER_VOLUME_SET),
+        prepare_media_player_volume, _tap_media_player,
+    ),
+    AttributeHandler(
+        "media_player", "media_position", "media_seek",
+        lambda state: _has_feature(state, "media_position", MEDIA_PLAYER_SEEK),
+        prepare_media_position, _tap_media_player,
+    ),
+    AttributeHandler(
+        "climate", "temperature", "set_temperature",
+        lambda state: _has_feature(state, "temperature", CLIMATE_TARGET_TEMPERATURE),
+        prepare_climate_temperature, _tap_climate,
+    ),
+    AttributeHandler(
+        "cover", "position", "set_cover_position",
+        lambda state: _has_feature(state, "current_position", COVER_SET_POSITION),
+        prepare_cover_position, _tap_cover,
+    ),
+    AttributeHandler(
+        "fan", "percentage", "set_percentage",
+        lambda state: _has_feature(state, "percentage", FAN_SET_SPEED),
+        prepare_fan_percentage, _tap_on_off,
+    ),
+    AttributeHandler("number", "value", "set_value", _always, prepare_number_value, None),
+    AttributeHandler("input_number", "value", "set_value", _always, prepare_number_value, None),
+):
+    register_handler(_handler)
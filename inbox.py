@@ -0,0 +1,112 @@
+"""Ordered, bounded queue of the samples of one device.
+
+Samples are checked when they are received and processed later in one
+batch per event loop turn. A sample is dropped if its device timestamp is
+older than the newest accepted one, if it arrived more than max_age
+milliseconds later than the fastest sample of the recent past, or if the
+queue is full, in which case the oldest queued sample makes room. Lifts
+are only ever dropped for a full queue, so a delayed lift still ends its
+gesture.
+
+The device clock does not need to match the Home Assistant clock. The
+delay of a sample is measured against the smallest difference between
+receive time and device time seen in the last one or two offset windows,
+so a constant clock offset and a slow drift cancel out.
+"""
+from __future__ import annotations
+
+from collections import deque
+import math
+
+from .parser import DreaSample
+
+# milliseconds of receive time per offset window
+OFFSET_WINDOW = 60_000
+# a device clock that jumps back by more than this restarted
+CLOCK_RESET = 60_000
+
+
+class SampleInbox:
+    """Samples of one device waiting to be processed."""
+
+    __slots__ = (
+        "samples",
+        "max_age",
+        "scheduled",
+        "waiting_since",
+        "last_timestamp",
+        "stale",
+        "out_of_order",
+        "overflow",
+        "_offset",
+        "_previous_offset",
+        "_window_end",
+    )
+
+    def __init__(self, size: int, max_age: int) -> None:
+        self.samples: deque[DreaSample] = deque(maxlen=size)
+        # 0 disables the staleness check
+        self.max_age = max_age
+        # True while a drain of the queue is scheduled
+        self.scheduled = False
+        # perf_counter of the oldest queued sample, only kept with metrics on
+        self.waiting_since = 0.0
+        self.last_timestamp: int | None = None
+        self.stale = 0
+        self.out_of_order = 0
+        self.overflow = 0
+        self._offset = math.inf
+        self._previous_offset = math.inf
+        self._window_end = 0.0
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def put(self, sample: DreaSample, received: float) -> bool:
+        """Queue a sample received at epoch milliseconds, return False if it was dropped.
+
+        A lift is never dropped, a late lift still has to end its gesture so
+        the final rotation value is sent.
+        """
+        timestamp = sample.timestamp
+        lift = sample.finger_count == 0
+        last_timestamp = self.last_timestamp
+        if last_timestamp is not None and timestamp < last_timestamp:
+            if last_timestamp - timestamp > CLOCK_RESET:
+                self._reset_offset()
+            elif lift:
+                return self._append(sample)
+            else:
+                self.out_of_order += 1
+                return False
+
+        offset = received - timestamp
+        if received >= self._window_end:
+            # after a long pause the old windows say nothing about the current delay
+            self._previous_offset = self._offset if received < self._window_end + OFFSET_WINDOW else math.inf
+            self._offset = math.inf
+            self._window_end = received + OFFSET_WINDOW
+        if offset < self._offset:
+            self._offset = offset
+        if not lift and self.max_age and offset - min(self._offset, self._previous_offset) > self.max_age:
+            self.stale += 1
+            return False
+
+        self.last_timestamp = timestamp
+        return self._append(sample)
+
+    def clear(self) -> None:
+        """Forget the queued samples."""
+        self.samples.clear()
+
+    def _append(self, sample: DreaSample) -> bool:
+        samples = self.samples
+        if len(samples) == samples.maxlen:
+            self.overflow += 1
+        samples.append(sample)
+        return True
+
+    def _reset_offset(self) -> None:
+        self._offset = math.inf
+        self._previous_offset = math.inf
+        self._window_end = 0.0
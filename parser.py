@@ -0,0 +1,206 @@
+"""Decoder for DREA sample payloads.
+
+A payload is either text, one ``timestamp,finger_count,rotation,rotation_sum``
+line per sample, or a packed binary frame::
+
+    uint8   version (FRAME_VERSION)
+    uint16  sample count n
+    int64   timestamp[n]
+    uint8   finger_count[n]
+    float32 rotation[n]         NaN when the sensor has no value
+    float32 rotation_sum[n]     NaN when the sensor has no value
+
+All numbers are little endian. The columns are stored one after another so
+a whole frame is decoded with four array copies. Infinite rotations, and
+NaN or infinity in a text line, are malformed.
+"""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Iterator
+import math
+import struct
+import sys
+from typing import NamedTuple
+
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<BH")
+
+_BIG_ENDIAN = sys.byteorder == "big"
+_NAN = math.nan
+_INF = math.inf
+_isfinite = math.isfinite
+
+
+class DreaSample(NamedTuple):
+    """One sample of a DREA device."""
+
+    timestamp: int
+    finger_count: int
+    rotation: float | None
+    rotation_sum: float | None
+
+
+# tokens the sensor sends instead of a rotation while no finger is down
+_NO_VALUE = frozenset(("", "None", "none", "null"))
+_new_sample = tuple.__new__
+
+
+def convert_drea_data(data_string: str) -> DreaSample | None:
+    """Parse one text sample, return None for a malformed line.
+
+    The field count is checked before any conversion and a well formed line
+    never raises, so only lines with broken numbers reach an except clause.
+    float() also parses nan and inf, which no rotation can be.
+    """
+    fields = data_string.split(",")
+    if len(fields) != 4:
+        return None
+    timestamp_str, finger_count_str, rotation_str, rotation_sum_str = fields
+    try:
+        if rotation_str in _NO_VALUE or rotation_sum_str in _NO_VALUE:
+            # lift and idle lines, checked first so they do not fail in float()
+            return _new_sample(DreaSample, (int(timestamp_str), int(finger_count_str), None, None))
+        rotation = float(rotation_str)
+        rotation_sum = float(rotation_sum_str)
+        if not (_isfinite(rotation) and _isfinite(rotation_sum)):
+            return None
+        return _new_sample(DreaSample, (int(timestamp_str), int(finger_count_str), rotation, rotation_sum))
+    except ValueError:
+        return None
+
+
+class SampleBatch:
+    """Column store of the samples of one payload."""
+
+    __slots__ = ("timestamps", "finger_counts", "rotations", "rotation_sums", "malformed")
+
+    def __init__(
+        self,
+        timestamps: array | None = None,
+        finger_counts: array | None = None,
+        rotations: array | None = None,
+        rotation_sums: array | None = None,
+    ) -> None:
+        self.timestamps = array("q") if timestamps is None else timestamps
+        self.finger_counts = array("B") if finger_counts is None else finger_counts
+        self.rotations = array("f") if rotations is None else rotations
+        self.rotation_sums = array("f") if rotation_sums is None else rotation_sums
+        self.malformed = 0
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: int, finger_count: int, rotation: float | None, rotation_sum: float | None) -> None:
+        """Add one sample, None is stored as NaN."""
+        self.timestamps.append(timestamp)
+        self.finger_counts.append(finger_count)
+        self.rotations.append(_NAN if rotation is None else rotation)
+        self.rotation_sums.append(_NAN if rotation_sum is None else rotation_sum)
+
+    def __iter__(self) -> Iterator[DreaSample]:
+        """Yield the samples, NaN is returned as None."""
+        for timestamp, finger_count, rotation, rotation_sum in zip(
+            self.timestamps, self.finger_counts, self.rotations, self.rotation_sums
+        ):
+            if rotation != rotation or rotation_sum != rotation_sum:
+                yield _new_sample(DreaSample, (timestamp, finger_count, None, None))
+            else:
+                yield _new_sample(DreaSample, (timestamp, finger_count, rotation, rotation_sum))
+
+    def sample(self, index: int) -> DreaSample:
+        """Return one sample, NaN is returned as None."""
+        rotation = self.rotations[index]
+        rotation_sum = self.rotation_sums[index]
+        if rotation != rotation or rotation_sum != rotation_sum:
+            return _new_sample(DreaSample, (self.timestamps[index], self.finger_counts[index], None, None))
+        return _new_sample(DreaSample, (self.timestamps[index], self.finger_counts[index], rotation, rotation_sum))
+
+
+def decode_payload(payload: str | bytes) -> SampleBatch | SampleList:
+    """Decode a text or binary payload, the format is detected by the first byte.
+
+    Both batch types iterate over DreaSample. Malformed lines and frames are
+    skipped and counted in their malformed attribute.
+    """
+    if isinstance(payload, (bytes, bytearray)):
+        if payload and payload[0] == FRAME_VERSION:
+            return decode_frame(payload)
+        payload = payload.decode("utf-8", "replace")
+    return decode_text(payload)
+
+
+class SampleList(list):
+    """Samples of a text payload."""
+
+    __slots__ = ("malformed",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.malformed = 0
+
+
+def decode_text(text: str) -> SampleList:
+    """Decode newline separated CSV samples."""
+    batch = SampleList()
+    for line in text.splitlines():
+        sample = convert_drea_data(line)
+        if sample is not None:
+            batch.append(sample)
+        elif line:
+            batch.malformed += 1
+    return batch
+
+
+def decode_frame(frame: bytes) -> SampleBatch:
+    """Decode a packed binary frame."""
+    batch = SampleBatch()
+    if len(frame) < FRAME_HEADER.size:
+        batch.malformed = 1
+        return batch
+    version, count = FRAME_HEADER.unpack_from(frame)
+    offset = FRAME_HEADER.size
+    if version != FRAME_VERSION or len(frame) != offset + count * 17:
+        batch.malformed = 1
+        return batch
+
+    view = memoryview(frame)
+    for column, width in (
+        (batch.timestamps, 8),
+        (batch.finger_counts, 1),
+        (batch.rotations, 4),
+        (batch.rotation_sums, 4),
+    ):
+        column.frombytes(view[offset:offset + count * width])
+        if _BIG_ENDIAN and width > 1:
+            column.byteswap()
+        offset += count * width
+    if _INF in batch.rotations or -_INF in batch.rotations or _INF in batch.rotation_sums or -_INF in batch.rotation_sums:
+        return _drop_infinite(batch)
+    return batch
+
+
+def _drop_infinite(batch: SampleBatch) -> SampleBatch:
+    """Return the samples of a frame without the infinite ones, counted as malformed."""
+    kept = SampleBatch()
+    for index, (rotation, rotation_sum) in enumerate(zip(batch.rotations, batch.rotation_sums)):
+        if rotation in (_INF, -_INF) or rotation_sum in (_INF, -_INF):
+            kept.malformed += 1
+            continue
+        kept.timestamps.append(batch.timestamps[index])
+        kept.finger_counts.append(batch.finger_counts[index])
+        kept.rotations.append(rotation)
+        kept.rotation_sums.append(rotation_sum)
+    return kept
+
+
+def encode_frame(samples: Iterable[tuple[int, int, float | None, float | None]]) -> bytes:
+    """Pack samples into a binary frame."""
+    batch = SampleBatch()
+    for sample in samples:
+        batch.append(*sample)
+    columns = [batch.timestamps, batch.finger_counts, batch.rotations, batch.rotation_sums]
+    if _BIG_ENDIAN:
+        for column in columns:
+            column.byteswap()
+    return FRAME_HEADER.pack(FRAME_VERSION, len(batch)) + b"".join(column.tobytes() for column in columns)
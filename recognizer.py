@@ -0,0 +1,264 @@
+"""Streaming gesture recognizer of a DREA knob.
+
+Every sample is handled in constant time. The finger count is a running
+vote with hysteresis. The rotation is tracked relative to the first sample
+of the touch, and the last RING_SIZE rotation samples are kept in a ring
+buffer to estimate the velocity at lift. A gesture becomes a rotation as
+soon as it passes the rotation threshold, and a tap is ruled out early
+when the gesture rotates or is held too long.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import NamedTuple
+
+from .const import (
+    DEFAULT_DOUBLE_TAP_WINDOW,
+    DEFAULT_FINGER_HYSTERESIS,
+    DEFAULT_FLING_VELOCITY,
+    DEFAULT_LONG_PRESS_DURATION,
+    DEFAULT_ROTATION_THRESHOLD,
+    DEFAULT_TAP_MAX_DURATION,
+    DEFAULT_TAP_MIN_DURATION,
+)
+from .parser import DreaSample
+
+GESTURE_TOUCH = "touch"
+GESTURE_ROTATE = "rotate"
+GESTURE_RELEASE = "release"
+GESTURE_TAP = "tap"
+# a tap that waits for the double tap window, see expire_pending_tap
+GESTURE_TAP_PENDING = "tap_pending"
+GESTURE_DOUBLE_TAP = "double_tap"
+GESTURE_LONG_PRESS = "long_press"
+GESTURE_FLING = "fling"
+
+RING_SIZE = 8
+MAX_FINGER_COUNT = 5
+# the finger count of a touch without any vote, taps used the two finger binding before
+DEFAULT_FINGER_COUNT = 2
+
+_IDLE = 0
+_UNDECIDED = 1
+_ROTATING = 2
+_PRESSED = 3
+
+
+class RecognizerConfig(NamedTuple):
+    """Thresholds of the recognizer, durations in ms and angles in degrees."""
+
+    tap_min_duration: int = DEFAULT_TAP_MIN_DURATION
+    tap_max_duration: int = DEFAULT_TAP_MAX_DURATION
+    rotation_threshold: float = DEFAULT_ROTATION_THRESHOLD
+    finger_hysteresis: int = DEFAULT_FINGER_HYSTERESIS
+    double_tap_window: int = DEFAULT_DOUBLE_TAP_WINDOW
+    long_press_duration: int = DEFAULT_LONG_PRESS_DURATION
+    fling_velocity: float = DEFAULT_FLING_VELOCITY
+
+
+class GestureRecognizer:
+    """Turn the samples of one knob into gestures.
+
+    push returns one of the GESTURE_* constants or None. The finger count
+    and the rotation of the current gesture are read from the attributes.
+    """
+
+    __slots__ = (
+        "config",
+        "first_sample",
+        "finger_count",
+        "rotation",
+        "rotated",
+        "confirmed_tap",
+        "_phase",
+        "_votes",
+        "_base_rotation",
+        "_ring_timestamps",
+        "_ring_rotations",
+        "_ring_index",
+        "_ring_filled",
+        "_pending_tap",
+        "_pending_tap_at",
+        "_double_tap_candidate",
+    )
+
+    def __init__(self, config: RecognizerConfig | None = None) -> None:
+        self.config = config or RecognizerConfig()
+        self.first_sample: DreaSample | None = None
+        self.finger_count = 0
+        self.rotation = 0.0
+        # True once the current or last gesture passed the rotation threshold
+        self.rotated = False
+        # finger count of a deferred single tap confirmed by the following gesture
+        self.confirmed_tap = 0
+        self._phase = _IDLE
+        self._votes = array("L", bytes(array("L").itemsize * (MAX_FINGER_COUNT + 1)))
+        self._base_rotation: float | None = None
+        self._ring_timestamps = array("q", bytes(8 * RING_SIZE))
+        self._ring_rotations = array("d", bytes(8 * RING_SIZE))
+        self._ring_index = 0
+        self._ring_filled = 0
+        self._pending_tap = 0
+        self._pending_tap_at = 0
+        self._double_tap_candidate = False
+
+    @property
+    def active(self) -> bool:
+        """Return True while fingers are down."""
+        return self._phase != _IDLE
+
+    @property
+    def votes(self) -> dict[int, int]:
+        """Return the finger count votes of the current gesture."""
+        return {finger_count: self._votes[finger_count] for finger_count in range(2, MAX_FINGER_COUNT + 1)}
+
+    @property
+    def velocity(self) -> float:
+        """Return the rotation speed over the ring buffer in degrees per second."""
+        if self._ring_filled < 2:
+            return 0.0
+        newest = (self._ring_index - 1) % RING_SIZE
+        oldest = (self._ring_index - self._ring_filled) % RING_SIZE
+        elapsed = self._ring_timestamps[newest] - self._ring_timestamps[oldest]
+        if elapsed <= 0:
+            return 0.0
+        return (self._ring_rotations[newest] - self._ring_rotations[oldest]) * 1000 / elapsed
+
+    def reset(self) -> None:
+        """Forget the current gesture and any deferred tap."""
+        self._phase = _IDLE
+        self.first_sample = None
+        self.finger_count = 0
+        self.rotation = 0.0
+        self.rotated = False
+        self.confirmed_tap = 0
+        self._pending_tap = 0
+        self._double_tap_candidate = False
+
+    def push(self, sample: DreaSample) -> str | None:
+        """Handle one sample and return the gesture it completes or advances."""
+        finger_count = sample.finger_count
+        phase = self._phase
+        if finger_count == 0:
+            if phase == _IDLE:
+                return None
+            return self._lift(sample)
+        if phase == _IDLE:
+            return self._touch(sample)
+
+        if 2 <= finger_count <= MAX_FINGER_COUNT:
+            self._vote(finger_count)
+            rotation_sum = sample.rotation_sum
+            if rotation_sum is not None:
+                self._track_rotation(sample.timestamp, rotation_sum)
+                if phase == _ROTATING:
+                    return GESTURE_ROTATE
+                if phase == _UNDECIDED and abs(self.rotation) >= self.config.rotation_threshold:
+                    self._phase = _ROTATING
+                    self.rotated = True
+                    self._confirm_pending_tap()
+                    return GESTURE_ROTATE
+
+        long_press_duration = self.config.long_press_duration
+        if (
+            phase == _UNDECIDED
+            and long_press_duration
+            and sample.timestamp - self.first_sample.timestamp >= long_press_duration
+        ):
+            self._phase = _PRESSED
+            self._confirm_pending_tap()
+            return GESTURE_LONG_PRESS
+        return None
+
+    def expire_pending_tap(self) -> int:
+        """End the double tap window, return the finger count of a single tap or 0.
+
+        A tap whose window already saw the next touch is decided on that lift.
+        """
+        if self._double_tap_candidate:
+            return 0
+        finger_count = self._pending_tap
+        self._pending_tap = 0
+        return finger_count
+
+    def _touch(self, sample: DreaSample) -> str:
+        self._phase = _UNDECIDED
+        self.first_sample = sample
+        self.rotation = 0.0
+        self.rotated = False
+        votes = self._votes
+        for index in range(MAX_FINGER_COUNT + 1):
+            votes[index] = 0
+        finger_count = sample.finger_count
+        if 2 <= finger_count <= MAX_FINGER_COUNT:
+            votes[finger_count] = 1
+            self.finger_count = finger_count
+        else:
+            self.finger_count = DEFAULT_FINGER_COUNT
+        self._base_rotation = None
+        self._ring_index = 0
+        self._ring_filled = 0
+        if sample.rotation_sum is not None:
+            self._track_rotation(sample.timestamp, sample.rotation_sum)
+        self._double_tap_candidate = bool(
+            self._pending_tap and sample.timestamp - self._pending_tap_at <= self.config.double_tap_window
+        )
+        return GESTURE_TOUCH
+
+    def _vote(self, finger_count: int) -> None:
+        votes = self._votes
+        votes[finger_count] += 1
+        leader = self.finger_count
+        if finger_count != leader and (
+            not votes[leader] or votes[finger_count] > votes[leader] + self.config.finger_hysteresis
+        ):
+            self.finger_count = finger_count
+
+    def _track_rotation(self, timestamp: int, rotation_sum: float) -> None:
+        if self._base_rotation is None:
+            self._base_rotation = rotation_sum
+        self.rotation = rotation_sum - self._base_rotation
+        index = self._ring_index
+        self._ring_timestamps[index] = timestamp
+        self._ring_rotations[index] = rotation_sum
+        self._ring_index = (index + 1) % RING_SIZE
+        if self._ring_filled < RING_SIZE:
+            self._ring_filled += 1
+
+    def _confirm_pending_tap(self) -> None:
+        if self._double_tap_candidate:
+            self.confirmed_tap = self._pending_tap
+            self._pending_tap = 0
+            self._double_tap_candidate = False
+
+    def _lift(self, sample: DreaSample) -> str:
+        phase = self._phase
+        self._phase = _IDLE
+        if phase == _ROTATING:
+            fling_velocity = self.config.fling_velocity
+            if fling_velocity and abs(self.velocity) >= fling_velocity:
+                return GESTURE_FLING
+            return GESTURE_RELEASE
+        if phase == _PRESSED:
+            return GESTURE_RELEASE
+
+        config = self.config
+        duration = sample.timestamp - self.first_sample.timestamp
+        # the lift sample rarely carries a rotation, the last known one decides
+        if sample.rotation_sum is not None and self._base_rotation is not None:
+            self.rotation = sample.rotation_sum - self._base_rotation
+        if not config.tap_min_duration < duration < config.tap_max_duration or abs(
+            self.rotation
+        ) >= config.rotation_threshold:
+            self._confirm_pending_tap()
+            return GESTURE_RELEASE
+
+        if self._double_tap_candidate:
+            self._pending_tap = 0
+            self._double_tap_candidate = False
+            return GESTURE_DOUBLE_TAP
+        if not config.double_tap_window:
+            return GESTURE_TAP
+        self._pending_tap = self.finger_count
+        self._pending_tap_at = sample.timestamp
+        return GESTURE_TAP_PENDING
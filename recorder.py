@@ -0,0 +1,37 @@
+"""Recorder platform of the Drea integration."""
+from __future__ import annotations
+
+from homeassistant.core import HomeAssistant, callback
+
+
+@callback
+def exclude_attributes(hass: HomeAssistant) -> set[str]:
+    """Exclude the attributes that change with every gesture from the recorder."""
+    return {
+        # gesture state and counters of drea.<device id>_last_message and drea.last_message
+        "last_message",
+        "finger_count",
+        "finger_count_count",
+        "first_message_with_finger",
+        "rotation",
+        "rotation_entities",
+        "messages",
+        "samples",
+        "malformed",
+        "errors",
+        "taps",
+        "rotations",
+        "double_taps",
+        "long_presses",
+        "flings",
+        "unchanged",
+        "feedback",
+        "priority",
+        # breakdowns of the telemetry sensors
+        "bound_entities",
+        "stale",
+        "out_of_order",
+        "overflow",
+        "superseded",
+        "cancelled",
+    }
@@ -0,0 +1,343 @@
+"""Record DREA MQTT streams and replay them through the message handler.
+
+Record the payloads of all knobs on a broker::
+
+    python -m custom_components.drea.replay record knobs.jsonl --host localhost
+
+Replay a recording at 4x speed against a stand-in for hass::
+
+    python -m custom_components.drea.replay replay knobs.jsonl \\
+        --options options.json --states states.json --speed 4
+
+``options.json`` holds the options of the config entries, either one
+mapping for all devices or a mapping from device id to options.
+``states.json`` maps entity ids to ``{"state": ..., "attributes": {...}}``.
+A speed of 0 replays as fast as possible.
+
+The replay runs the real handler of the integration, so Home Assistant
+must be importable, but no Home Assistant instance is started.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+from collections import defaultdict
+from collections.abc import Callable, Coroutine, Iterator
+import json
+import sys
+import time
+from types import MappingProxyType
+from typing import Any
+
+from homeassistant.core import State
+
+from . import async_route_message
+from .const import CONF_DEVICE_ID, DATA_DEVICES, DOMAIN, TOPIC_LEGACY, TOPIC_SUBSCRIBE
+from .device import DreaDevice
+from .engine import topic_device_id
+from .runner import StateStore, load_json
+
+PERCENTILES = (50, 90, 99)
+
+
+def write_record(file, received: float, topic: str, payload: str | bytes) -> None:
+    """Append one received message to a recording."""
+    record: dict[str, Any] = {"t": round(received, 6), "topic": topic}
+    if isinstance(payload, str):
+        record["payload"] = payload
+    else:
+        record["payload_b64"] = base64.b64encode(payload).decode("ascii")
+    file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def read_records(path: str) -> Iterator[tuple[float, str, str | bytes]]:
+    """Yield receive time, topic and payload of a recording."""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "payload_b64" in record:
+                payload: str | bytes = base64.b64decode(record["payload_b64"])
+            else:
+                payload = record["payload"]
+            yield record["t"], record["topic"], payload
+
+
+def record(host: str, port: int, path: str, duration: float | None) -> None:
+    """Record all DREA payloads of a broker until interrupted."""
+    try:
+        import paho.mqtt.client as paho  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        sys.exit("Recording needs paho-mqtt: pip install paho-mqtt")
+
+    start = time.monotonic()
+    with open(path, "w", encoding="utf-8") as file:
+
+        def on_connect(client, userdata, flags, rc):
+            client.subscribe([(TOPIC_SUBSCRIBE, 0), (TOPIC_LEGACY, 0)])
+
+        def on_message(client, userdata, msg):
+            write_record(file, time.monotonic() - start, msg.topic, msg.payload)
+
+        client = paho.Client()
+        client.on_connect = on_connect
+        client.on_message = on_message
+        client.connect(host, port)
+        client.loop_start()
+        try:
+            time.sleep(duration) if duration else _wait_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            client.loop_stop()
+            client.disconnect()
+
+
+def _wait_forever() -> None:
+    while True:
+        time.sleep(3600)
+
+
+class FakeStates(StateStore):
+    """State machine stand-in keeping real State objects."""
+
+    state_class = State
+
+    def async_all(self, domain_filter: str | set[str] | None = None) -> list[State]:
+        if domain_filter is None:
+            return list(self._states.values())
+        if isinstance(domain_filter, str):
+            domain_filter = {domain_filter}
+        return [state for state in self._states.values() if state.domain in domain_filter]
+
+    def async_remove(self, entity_id: str) -> bool:
+        return self._states.pop(entity_id, None) is not None
+
+
+class FakeServices:
+    """Service registry stand-in that records calls and updates the states."""
+
+    def __init__(self, states: FakeStates, latency: float) -> None:
+        self._states = states
+        self._latency = latency
+        self.calls: list[tuple[float, str, str, dict[str, Any]]] = []
+
+    async def async_call(
+        self, domain: str, service: str, service_data: dict[str, Any] | None = None, blocking: bool = False, **kwargs
+    ) -> None:
+        data = dict(service_data or {})
+        self.calls.append((time.monotonic(), domain, service, data))
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        self._states.apply(service, data)
+
+
+class FakeConfigEntries:
+    """Config entry registry stand-in."""
+
+    def __init__(self) -> None:
+        self.entries: list[FakeConfigEntry] = []
+
+    def async_entries(self, domain: str | None = None) -> list[FakeConfigEntry]:
+        return [entry for entry in self.entries if domain is None or entry.domain == domain]
+
+    def async_update_entry(self, entry: FakeConfigEntry, **kwargs) -> None:
+        for key, value in kwargs.items():
+            setattr(entry, key, MappingProxyType(dict(value)) if key in ("data", "options") else value)
+
+
+class FakeConfigEntry:
+    """Config entry of one replayed device."""
+
+    def __init__(self, device_id: str, options: dict[str, Any]) -> None:
+        self.domain = DOMAIN
+        self.entry_id = device_id
+        self.data = MappingProxyType({CONF_DEVICE_ID: device_id})
+        self.options = MappingProxyType(options)
+
+    def async_on_unload(self, func: Callable[[], None]) -> None:
+        """Nothing is unloaded during a replay."""
+
+    def add_update_listener(self, listener: Callable) -> Callable[[], None]:
+        return lambda: None
+
+
+class FakeBus:
+    """Event bus stand-in that records fired events."""
+
+    def __init__(self) -> None:
+        self.events: list[tuple[str, dict[str, Any]]] = []
+
+    def async_fire(self, event_type: str, event_data: dict[str, Any] | None = None, *args, **kwargs) -> None:
+        self.events.append((event_type, dict(event_data or {})))
+
+    def async_listen(self, event_type: str, listener: Callable, *args, **kwargs) -> Callable[[], None]:
+        """Nothing changes the states or registries during a replay."""
+        return lambda: None
+
+
+class FakeHomeAssistant:
+    """Just enough of hass to run the DREA message handler."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, service_latency: float = 0.0) -> None:
+        self.loop = loop
+        self.data: dict[str, Any] = {DOMAIN: {DATA_DEVICES: {}}}
+        self.states = FakeStates()
+        self.services = FakeServices(self.states, service_latency)
+        self.config_entries = FakeConfigEntries()
+        self.bus = FakeBus()
+        self.published: list[tuple[float, str, str]] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    def async_create_task(self, target: Coroutine[Any, Any, Any], name: str | None = None) -> asyncio.Task:
+        task = self.loop.create_task(target)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def async_block_till_done(self) -> None:
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
+
+    async def async_publish(self, topic: str, payload: str) -> None:
+        """Record an MQTT message instead of publishing it."""
+        self.published.append((time.monotonic(), topic, payload))
+
+    def add_device(self, device_id: str, options: dict[str, Any]) -> DreaDevice:
+        """Set up a device the way async_setup_entry does."""
+        entry = FakeConfigEntry(device_id, options)
+        self.config_entries.entries.append(entry)
+        device = DreaDevice(self, entry)  # type: ignore[arg-type]
+        device.feedback.publish = self.async_publish
+        device.async_configure()
+        self.data[DOMAIN][DATA_DEVICES][device_id] = device
+        return device
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))
+    return sorted_values[index]
+
+
+async def async_replay(
+    records: list[tuple[float, str, str | bytes]],
+    options: dict[str, Any],
+    states: dict[str, dict[str, Any]],
+    speed: float = 1.0,
+    service_latency: float = 0.0,
+) -> dict[str, Any]:
+    """Replay recorded messages and return the report."""
+    hass = FakeHomeAssistant(asyncio.get_running_loop(), service_latency)
+    for entity_id, state in states.items():
+        hass.states.async_set(entity_id, state["state"], state.get("attributes", {}))
+
+    device_ids = sorted({topic_device_id(topic) for _, topic, _ in records})
+    for device_id in device_ids:
+        hass.add_device(device_id, dict(options.get(device_id, options)))
+
+    devices = hass.data[DOMAIN][DATA_DEVICES]
+    latencies: list[float] = []
+    start = time.monotonic()
+    first = records[0][0] if records else 0.0
+    for received, topic, payload in records:
+        if speed > 0:
+            delay = start + (received - first) / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        begin = time.perf_counter()
+        async_route_message(hass, topic, payload)  # type: ignore[arg-type]
+        device = devices.get(topic_device_id(topic))
+        if device is not None:
+            # process the queue right away to time the whole path, the scheduled run finds it empty
+            device.async_process_samples()
+        latencies.append(time.perf_counter() - begin)
+    replay_end = time.monotonic()
+
+    # let the dispatchers send their final values
+    await asyncio.sleep(max(1.0, service_latency * 2))
+    await hass.async_block_till_done()
+    duration = max(replay_end - start, 1e-9)
+
+    calls: dict[str, int] = defaultdict(int)
+    for _, domain, service, data in hass.services.calls:
+        entity_ids = data.get("entity_id", [])
+        for entity_id in [entity_ids] if isinstance(entity_ids, str) else entity_ids:
+            calls[f"{entity_id} {domain}.{service}"] += 1
+
+    latencies.sort()
+    return {
+        "messages": len(records),
+        "duration_s": round(duration, 3),
+        "latency_us": {
+            **{f"p{p}": round(_percentile(latencies, p) * 1e6, 1) for p in PERCENTILES},
+            "max": round(latencies[-1] * 1e6, 1) if latencies else 0.0,
+        },
+        "service_calls": {
+            key: {"count": count, "per_s": round(count / duration, 2)} for key, count in sorted(calls.items())
+        },
+        "devices": {
+            device_id: device.counters()
+            for device_id, device in devices.items()
+        },
+        "events": len(hass.bus.events),
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(f"messages    {report['messages']} in {report['duration_s']} s")
+    print("latency us  " + "  ".join(f"{key} {value}" for key, value in report["latency_us"].items()))
+    print("service calls")
+    for key, value in report["service_calls"].items():
+        print(f"  {key:<50} {value['count']:>6}  {value['per_s']:>8}/s")
+    print("devices")
+    for device_id, stats in report["devices"].items():
+        print(f"  {device_id:<20} " + "  ".join(f"{key} {value}" for key, value in stats.items()))
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="record payloads from a broker")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--host", default="localhost")
+    record_parser.add_argument("--port", type=int, default=1883)
+    record_parser.add_argument("--duration", type=float, help="seconds, default until Ctrl+C")
+
+    replay_parser = commands.add_parser("replay", help="replay a recording through the handler")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--options", help="JSON file with the config entry options")
+    replay_parser.add_argument("--states", help="JSON file with the initial entity states")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 0 for maximum")
+    replay_parser.add_argument("--service-latency", type=float, default=0.0, help="seconds per service call")
+    replay_parser.add_argument("--json", help="also write the report to this file")
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        record(args.host, args.port, args.path, args.duration)
+        return
+
+    report = asyncio.run(
+        async_replay(
+            list(read_records(args.path)),
+            load_json(args.options),
+            load_json(args.states),
+            args.speed,
+            args.service_latency,
+        )
+    )
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+"""Run the gesture engine against an MQTT broker without Home Assistant.
+
+Handle all knobs on a broker and write the resolved service calls and
+gesture events to a file::
+
+    python custom_components/drea/runner.py run --host localhost \\
+        --options options.json --states states.json --output commands.jsonl
+
+Every knob that publishes on drea/<device id>/data, and the legacy knob on the
+bare drea topic, gets its own engine.
+``options.json`` holds the options, either one mapping for all knobs or a
+mapping from device id to options, and ``states.json`` the entity states,
+as for replay.py. The service calls go through the same rate-limited
+dispatcher as in Home Assistant and are applied to these states, so the
+next touch starts from the new value. Without --output they are only
+counted. The feedback of a rotation is published to the knob as in Home
+Assistant. The throughput and the memory use are printed every --interval
+seconds.
+
+Publish the streams of simulated knobs for a soak test::
+
+    python custom_components/drea/runner.py simulate --host localhost --knobs 200
+
+From code, KnobRunner hands the calls to any CommandSink, for example a
+CallbackSink. The runner and the engine do not import Home Assistant. Run
+as a script, the modules are imported from a bare package, because the
+package __init__ sets up the MQTT integration of Home Assistant. Both
+commands need paho-mqtt.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable, Mapping
+from functools import partial
+import json
+import logging
+import os
+import sys
+import time
+from types import MappingProxyType, ModuleType
+from typing import Any, Protocol
+
+if __name__ == "__main__" and not __package__:
+    # run as a script, the package __init__ would import Home Assistant
+    _package = ModuleType("drea")
+    _package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+    sys.modules.setdefault("drea", _package)
+    __package__ = "drea"  # pylint: disable=redefined-builtin
+
+# pylint: disable=wrong-import-position
+from .binding import build_bindings
+from .const import (
+    CONF_METRICS,
+    DEFAULT_FEEDBACK_RATE,
+    DEFAULT_MAX_COMMAND_RATE,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_METRICS,
+    EVENT_GESTURE,
+    TOPIC_DATA,
+    TOPIC_FEEDBACK,
+    TOPIC_LEGACY,
+    TOPIC_SUBSCRIBE,
+)
+from .dispatcher import ServiceDispatcher
+from .engine import DreaEngine, topic_device_id
+from .feedback import FeedbackPublisher, PublishCallback
+from .stats import DeviceMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+REPORT_INTERVAL = 10.0
+SIMULATED_DEVICE_ID = "sim-{}"
+# samples per second of a simulated knob and samples per message
+SIMULATED_RATE = 100.0
+SIMULATED_BATCH = 5
+
+
+class CommandSink(Protocol):
+    """Receiver of the resolved service calls and gesture events."""
+
+    async def async_command(self, device_id: str, domain: str, service: str, data: dict[str, Any]) -> None:
+        """Handle one service call."""
+
+    def gesture(self, data: dict[str, Any]) -> None:
+        """Handle the data of one drea_gesture event."""
+
+    def close(self) -> None:
+        """Release the sink."""
+
+
+class CallbackSink:
+    """Hand the service calls and gesture events to plain callbacks."""
+
+    def __init__(
+        self,
+        on_command: Callable[[str, str, str, dict[str, Any]], None] | None = None,
+        on_gesture: Callable[[dict[str, Any]], None] | None = None,
+    ) -> None:
+        self._on_command = on_command
+        self._on_gesture = on_gesture
+
+    async def async_command(self, device_id: str, domain: str, service: str, data: dict[str, Any]) -> None:
+        if self._on_command is not None:
+            self._on_command(device_id, domain, service, data)
+
+    def gesture(self, data: dict[str, Any]) -> None:
+        if self._on_gesture is not None:
+            self._on_gesture(data)
+
+    def close(self) -> None:
+        """Nothing to release."""
+
+
+class FileSink:
+    """Write the service calls and gesture events as JSON lines."""
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+        self._start = time.monotonic()
+
+    async def async_command(self, device_id: str, domain: str, service: str, data: dict[str, Any]) -> None:
+        self._write({"device_id": device_id, "service": f"{domain}.{service}", "data": data})
+
+    def gesture(self, data: dict[str, Any]) -> None:
+        self._write({"event": EVENT_GESTURE, "data": data})
+
+    def _write(self, record: dict[str, Any]) -> None:
+        record["t"] = round(time.monotonic() - self._start, 6)
+        self._file.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class EntityState:
+    """The state of an entity, with what the engine reads of State."""
+
+    __slots__ = ("entity_id", "domain", "state", "attributes")
+
+    def __init__(self, entity_id: str, state: str, attributes: Mapping[str, Any] | None = None) -> None:
+        self.entity_id = entity_id
+        self.domain = entity_id.split(".", 1)[0]
+        self.state = state
+        self.attributes = MappingProxyType(dict(attributes or {}))
+
+
+class StateStore:
+    """Entity states that follow the service calls made on them."""
+
+    # replay.py keeps the State objects of Home Assistant
+    state_class: Callable[..., Any] = EntityState
+
+    def __init__(self, states: Mapping[str, Mapping[str, Any]] | None = None) -> None:
+        self._states: dict[str, EntityState] = {}
+        for entity_id, state in (states or {}).items():
+            self.async_set(entity_id, state["state"], state.get("attributes", {}))
+
+    def get(self, entity_id: str) -> EntityState | None:
+        return self._states.get(entity_id)
+
+    def async_set(self, entity_id: str, new_state: str, attributes: dict[str, Any] | None = None, *args, **kwargs) -> None:
+        self._states[entity_id] = self.state_class(entity_id, new_state, attributes)
+
+    def apply(self, service: str, data: dict[str, Any]) -> None:
+        """Mimic the effect of the services the integration calls."""
+        data = dict(data)
+        entity_ids = data.pop("entity_id", [])
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        for entity_id in entity_ids:
+            state = self._states.get(entity_id)
+            attributes = dict(state.attributes) if state is not None else {}
+            new_state = state.state if state is not None else "on"
+            changes = data
+            if service == "turn_off":
+                new_state = "off"
+            elif service == "turn_on":
+                new_state = "on"
+            elif service == "volume_set":
+                changes = {"volume_level": data.get("volume_level")}
+            elif service == "media_seek":
+                changes = {"media_position": data.get("seek_position")}
+            elif service == "set_cover_position":
+                changes = {"current_position": data.get("position")}
+            elif service == "set_value":
+                new_state = str(data.get("value", new_state))
+                changes = {}
+            attributes.update(changes)
+            self.async_set(entity_id, new_state, attributes)
+
+
+class KnobRunner:
+    """Engines of all knobs of a broker, created on their first message."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        options: Mapping[str, Any],
+        states: StateStore,
+        sink: CommandSink,
+        service_latency: float = 0.0,
+        publish: PublishCallback | None = None,
+    ) -> None:
+        self.loop = loop
+        self._options = options
+        self.states = states
+        self.sink = sink
+        self._service_latency = service_latency
+        # publishes the feedback to the knobs, None sends no feedback
+        self._publish = publish
+        self.engines: dict[str, DreaEngine] = {}
+        self.commands = 0
+        self.gestures = 0
+
+    def route(self, topic: str, payload: str | bytes) -> None:
+        """Hand a message on drea/<device id>/data or the legacy topic to the engine of its knob."""
+        device_id = topic_device_id(topic)
+        engine = self.engines.get(device_id)
+        if engine is None:
+            engine = self.engines[device_id] = self._create_engine(device_id)
+        engine.handle_message(payload)
+
+    def _create_engine(self, device_id: str) -> DreaEngine:
+        options = self._options.get(device_id, self._options)
+        metrics = DeviceMetrics() if options.get(CONF_METRICS, DEFAULT_METRICS) else None
+        dispatcher = ServiceDispatcher(
+            self.loop, partial(self._async_call, device_id), DEFAULT_MAX_COMMAND_RATE, DEFAULT_MAX_IN_FLIGHT, metrics
+        )
+        feedback = None
+        if self._publish is not None:
+            feedback = FeedbackPublisher(
+                self.loop, self._publish, TOPIC_FEEDBACK.format(device_id), DEFAULT_FEEDBACK_RATE
+            )
+        engine = DreaEngine(device_id, self.loop, dispatcher, self.states.get, self._fire_gesture, feedback, metrics)
+        engine.bindings = build_bindings(options, self.states.get)
+        engine.async_apply_options(options)
+        return engine
+
+    async def _async_call(self, device_id: str, domain: str, service: str, data: dict[str, Any]) -> None:
+        self.commands += 1
+        try:
+            if self._service_latency:
+                await asyncio.sleep(self._service_latency)
+            self.states.apply(service, data)
+            await self.sink.async_command(device_id, domain, service, data)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error handling %s.%s for %s", domain, service, data.get("entity_id"))
+
+    def _fire_gesture(self, data: dict[str, Any]) -> None:
+        self.gestures += 1
+        self.sink.gesture(data)
+
+    def totals(self) -> dict[str, int]:
+        """Return the counters summed over all knobs."""
+        totals: dict[str, int] = {"knobs": len(self.engines), "commands": self.commands, "gestures": self.gestures}
+        for engine in self.engines.values():
+            for key, value in engine.counters().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def shutdown(self) -> None:
+        """Stop the engines and close the sink."""
+        for engine in self.engines.values():
+            engine.async_shutdown()
+        self.sink.close()
+
+
+def rss_mib() -> float:
+    """Return the resident memory of the process, the peak where procfs is missing."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource  # pylint: disable=import-outside-toplevel
+
+        # kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+async def _async_report(runner: KnobRunner, interval: float) -> None:
+    previous = runner.totals()
+    while True:
+        await asyncio.sleep(interval)
+        totals = runner.totals()
+        rates = {key: (totals[key] - previous.get(key, 0)) / interval for key in ("messages", "samples", "commands")}
+        dropped = sum(totals[key] for key in ("stale", "out_of_order", "overflow"))
+        print(
+            f"knobs {totals['knobs']}  messages {rates['messages']:.0f}/s  samples {rates['samples']:.0f}/s"
+            f"  commands {rates['commands']:.0f}/s  gestures {totals['gestures']}  dropped {dropped}"
+            f"  errors {totals['errors']}  rss {rss_mib():.1f} MiB",
+            flush=True,
+        )
+        previous = totals
+
+
+async def async_run(
+    host: str,
+    port: int,
+    options: Mapping[str, Any],
+    states: Mapping[str, Mapping[str, Any]],
+    sink: CommandSink,
+    duration: float | None = None,
+    interval: float = REPORT_INTERVAL,
+    service_latency: float = 0.0,
+) -> dict[str, int]:
+    """Run the engines of all knobs on a broker and return the totals."""
+    try:
+        import paho.mqtt.client as paho  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        sys.exit("The runner needs paho-mqtt: pip install paho-mqtt")
+
+    loop = asyncio.get_running_loop()
+    client = paho.Client()
+
+    async def async_publish(topic: str, payload: str) -> None:
+        # only queues the message, the network thread of paho sends it
+        client.publish(topic, payload)
+
+    runner = KnobRunner(loop, options, StateStore(states), sink, service_latency, async_publish)
+
+    def on_connect(client, userdata, flags, rc):
+        client.subscribe([(TOPIC_SUBSCRIBE, 0), (TOPIC_LEGACY, 0)])
+
+    def on_message(client, userdata, msg):
+        # called from the network thread of paho
+        loop.call_soon_threadsafe(runner.route, msg.topic, msg.payload)
+
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(host, port)
+    client.loop_start()
+    report = loop.create_task(_async_report(runner, interval))
+    try:
+        if duration:
+            await asyncio.sleep(duration)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        report.cancel()
+        runner.shutdown()
+        print("totals  " + "  ".join(f"{key} {value}" for key, value in runner.totals().items()))
+    return runner.totals()
+
+
+def simulation_cycle() -> list[tuple[int, float | None, float | None] | None]:
+    """Return the samples of one cycle of a simulated knob, None where it is not touched.
+
+    A two finger rotation of 100 samples is followed by a pause, a three
+    finger tap of 30 samples and a longer pause.
+    """
+    cycle: list[tuple[int, float | None, float | None] | None] = [
+        (2, -1.5, -1.5 * index) for index in range(100)
+    ]
+    cycle.append((0, None, None))
+    cycle.extend([None] * 50)
+    cycle.extend([(3, 0.0, 0.0)] * 30)
+    cycle.append((0, None, None))
+    cycle.extend([None] * 100)
+    return cycle
+
+
+def simulate(
+    host: str,
+    port: int,
+    knobs: int,
+    rate: float = SIMULATED_RATE,
+    batch: int = SIMULATED_BATCH,
+    duration: float | None = None,
+) -> None:
+    """Publish the text payloads of simulated knobs until interrupted."""
+    try:
+        import paho.mqtt.client as paho  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        sys.exit("Simulating needs paho-mqtt: pip install paho-mqtt")
+
+    cycle = simulation_cycle()
+    topics = [TOPIC_DATA.format(SIMULATED_DEVICE_ID.format(index)) for index in range(knobs)]
+    pending: list[list[str]] = [[] for _ in topics]
+    client = paho.Client()
+    client.connect(host, port)
+    client.loop_start()
+    interval = 1.0 / rate
+    start = time.monotonic()
+    tick = published = 0
+    try:
+        while duration is None or tick * interval < duration:
+            timestamp = round(time.time() * 1000)
+            for index, topic in enumerate(topics):
+                # shift the cycle so the knobs do not move in step
+                sample = cycle[(tick + index * 37) % len(cycle)]
+                lines = pending[index]
+                if sample is not None:
+                    lines.append(f"{timestamp},{sample[0]},{sample[1]},{sample[2]}")
+                if lines and (len(lines) >= batch or sample is None or sample[0] == 0):
+                    client.publish(topic, "\n".join(lines))
+                    lines.clear()
+                    published += 1
+            tick += 1
+            delay = start + tick * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    print(f"published {published} messages of {knobs} knobs in {time.monotonic() - start:.1f} s")
+
+
+def load_json(path: str | None) -> dict[str, Any]:
+    """Return the content of a JSON file, an empty mapping without a path."""
+    if path is None:
+        return {}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the engines of the knobs on a broker")
+    run_parser.add_argument("--host", default="localhost")
+    run_parser.add_argument("--port", type=int, default=1883)
+    run_parser.add_argument("--options", help="JSON file with the options of the knobs")
+    run_parser.add_argument("--states", help="JSON file with the initial entity states")
+    run_parser.add_argument("--output", help="write the service calls and gestures to this JSON lines file")
+    run_parser.add_argument("--duration", type=float, help="seconds, default until Ctrl+C")
+    run_parser.add_argument("--interval", type=float, default=REPORT_INTERVAL, help="seconds between reports")
+    run_parser.add_argument("--service-latency", type=float, default=0.0, help="seconds per service call")
+
+    simulate_parser = commands.add_parser("simulate", help="publish the streams of simulated knobs")
+    simulate_parser.add_argument("--host", default="localhost")
+    simulate_parser.add_argument("--port", type=int, default=1883)
+    simulate_parser.add_argument("--knobs", type=int, default=1)
+    simulate_parser.add_argument("--rate", type=float, default=SIMULATED_RATE, help="samples per second per knob")
+    simulate_parser.add_argument("--batch", type=int, default=SIMULATED_BATCH, help="samples per message")
+    simulate_parser.add_argument("--duration", type=float, help="seconds, default until Ctrl+C")
+
+    args = parser.parse_args(argv)
+    if args.command == "simulate":
+        simulate(args.host, args.port, args.knobs, args.rate, args.batch, args.duration)
+        return
+
+    sink: CommandSink = FileSink(args.output) if args.output else CallbackSink()
+    try:
+        asyncio.run(
+            async_run(
+                args.host,
+                args.port,
+                load_json(args.options),
+                load_json(args.states),
+                sink,
+                args.duration,
+                args.interval,
+                args.service_latency,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Sensors of the Drea integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+from time import monotonic
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import StateType
+
+from .const import CONF_DEVICE_ID, DATA_DEVICES, DOMAIN
+from .device import DreaDevice
+from .stats import STAGE_HANDLER, DeviceMetrics, RateCounter
+
+# telemetry is sampled at this interval, never per message
+SCAN_INTERVAL = timedelta(seconds=10)
+
+
+def _latency_ms(metrics: DeviceMetrics, percentile: float) -> float | None:
+    latency = metrics.latency(STAGE_HANDLER, percentile)
+    return None if latency is None else round(latency * 1000, 3)
+
+
+@dataclass
+class DreaMetricRequiredKeysMixin:
+    """Mixin for required keys."""
+
+    value_fn: Callable[[DeviceMetrics], float | None]
+
+
+@dataclass
+class DreaMetricSensorEntityDescription(SensorEntityDescription, DreaMetricRequiredKeysMixin):
+    """Describes a DREA metrics sensor."""
+
+
+METRIC_SENSORS: tuple[DreaMetricSensorEntityDescription, ...] = (
+    DreaMetricSensorEntityDescription(
+        key="latency_p50",
+        name="Processing latency p50",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        value_fn=lambda metrics: _latency_ms(metrics, 50),
+    ),
+    DreaMetricSensorEntityDescription(
+        key="latency_p99",
+        name="Processing latency p99",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        value_fn=lambda metrics: _latency_ms(metrics, 99),
+    ),
+    DreaMetricSensorEntityDescription(
+        key="messages_per_second",
+        name="Messages per second",
+        native_unit_of_measurement="msg/s",
+        value_fn=lambda metrics: round(metrics.messages.rate, 2),
+    ),
+    DreaMetricSensorEntityDescription(
+        key="errors_per_second",
+        name="Errors per second",
+        native_unit_of_measurement="1/s",
+        value_fn=lambda metrics: round(metrics.errors.rate, 2),
+    ),
+)
+
+
+def _gestures(device: DreaDevice) -> int:
+    return device.taps + device.rotations + device.double_taps + device.long_presses + device.flings
+
+
+def _finger_count(device: DreaDevice) -> int | None:
+    return device.session.recognizer.finger_count or None
+
+
+def _active_binding(device: DreaDevice) -> str | None:
+    binding = device.bindings.get(device.session.recognizer.finger_count)
+    return binding.attribute if binding is not None else None
+
+
+def _active_binding_attributes(device: DreaDevice) -> dict[str, Any]:
+    finger_count = device.session.recognizer.finger_count
+    binding = device.bindings.get(finger_count)
+    return {
+        "finger_count": finger_count or None,
+        "bound_entities": binding.entity_ids if binding is not None else [],
+    }
+
+
+def _dropped_attributes(device: DreaDevice) -> dict[str, Any]:
+    inbox = device.inbox
+    return {"stale": inbox.stale, "out_of_order": inbox.out_of_order, "overflow": inbox.overflow}
+
+
+def _suppressed_attributes(device: DreaDevice) -> dict[str, Any]:
+    dispatcher = device.dispatcher
+    return {"superseded": dispatcher.superseded, "cancelled": dispatcher.cancelled, "unchanged": device.unchanged}
+
+
+@dataclass
+class DreaTelemetryRequiredKeysMixin:
+    """Mixin for required keys."""
+
+    value_fn: Callable[[DreaDevice], StateType]
+
+
+@dataclass
+class DreaTelemetrySensorEntityDescription(SensorEntityDescription, DreaTelemetryRequiredKeysMixin):
+    """Describes a DREA telemetry sensor.
+
+    With rate_factor set, value_fn returns a counter total and the sensor
+    shows its rate per second times rate_factor.
+    """
+
+    rate_factor: float | None = None
+    attributes_fn: Callable[[DreaDevice], dict[str, Any]] | None = None
+
+
+TELEMETRY_SENSORS: tuple[DreaTelemetrySensorEntityDescription, ...] = (
+    DreaTelemetrySensorEntityDescription(
+        key="sample_rate",
+        name="Sample rate",
+        native_unit_of_measurement="samples/s",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda device: device.samples,
+        rate_factor=1.0,
+    ),
+    DreaTelemetrySensorEntityDescription(
+        key="gestures_per_minute",
+        name="Gestures per minute",
+        native_unit_of_measurement="gestures/min",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_gestures,
+        rate_factor=60.0,
+    ),
+    DreaTelemetrySensorEntityDescription(
+        key="finger_count",
+        name="Finger count",
+        value_fn=_finger_count,
+    ),
+    DreaTelemetrySensorEntityDescription(
+        key="active_binding",
+        name="Active binding",
+        value_fn=_active_binding,
+        attributes_fn=_active_binding_attributes,
+    ),
+    DreaTelemetrySensorEntityDescription(
+        key="dropped_samples",
+        name="Dropped samples",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.inbox.stale + device.inbox.out_of_order + device.inbox.overflow,
+        attributes_fn=_dropped_attributes,
+    ),
+    DreaTelemetrySensorEntityDescription(
+        key="malformed_samples",
+        name="Malformed samples",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.malformed,
+    ),
+    DreaTelemetrySensorEntityDescription(
+        key="service_calls_sent",
+        name="Service calls sent",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.dispatcher.sent + device.dispatcher.priority,
+    ),
+    DreaTelemetrySensorEntityDescription(
+        key="service_calls_suppressed",
+        name="Service calls suppressed",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.dispatcher.superseded + device.dispatcher.cancelled + device.unchanged,
+        attributes_fn=_suppressed_attributes,
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """Set up the sensors of a DREA device."""
+    device: DreaDevice = hass.data[DOMAIN][DATA_DEVICES][entry.data[CONF_DEVICE_ID]]
+    entities: list[DreaSensor] = [DreaTelemetrySensor(device, description) for description in TELEMETRY_SENSORS]
+    if device.metrics is not None:
+        entities.extend(DreaMetricSensor(device, description) for description in METRIC_SENSORS)
+    async_add_entities(entities)
+
+
+class DreaSensor(SensorEntity):
+    """Diagnostic sensor of a DREA device."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, device: DreaDevice, description: SensorEntityDescription) -> None:
+        self.entity_description = description
+        self._device = device
+        self._attr_unique_id = f"{device.device_id}_{description.key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, device.device_id)},
+            name=f"DREA {device.device_id}",
+        )
+
+
+class DreaTelemetrySensor(DreaSensor):
+    """Counter, rate or state of a DREA device, read at the scan interval."""
+
+    entity_description: DreaTelemetrySensorEntityDescription
+
+    def __init__(self, device: DreaDevice, description: DreaTelemetrySensorEntityDescription) -> None:
+        super().__init__(device, description)
+        self._rate = RateCounter() if description.rate_factor is not None else None
+
+    async def async_update(self) -> None:
+        """Read the counters of the device."""
+        description = self.entity_description
+        value = description.value_fn(self._device)
+        if self._rate is not None:
+            self._rate.rotate(monotonic(), value)
+            value = round(self._rate.rate * description.rate_factor, 2)
+        self._attr_native_value = value
+        if description.attributes_fn is not None:
+            self._attr_extra_state_attributes = description.attributes_fn(self._device)
+
+
+class DreaMetricSensor(DreaSensor):
+    """Latency or rate measured by the DREA instrumentation."""
+
+    entity_description: DreaMetricSensorEntityDescription
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the current value."""
+        metrics = self._device.metrics
+        if metrics is None:
+            return None
+        return self.entity_description.value_fn(metrics)
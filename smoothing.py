@@ -0,0 +1,86 @@
+"""Adaptive smoothing of the rotation of a gesture.
+
+The filter is a One Euro filter: a low-pass filter whose cutoff frequency
+rises with the rotation speed. A still hand gets heavy smoothing and a
+fast turn is followed closely. With beta 0 it is a plain exponential
+moving average at the minimum cutoff. A dead zone then holds back values
+that moved less than dead_zone degrees from the last value let through.
+"""
+from __future__ import annotations
+
+import math
+
+SMOOTHING_NONE = "none"
+SMOOTHING_EMA = "ema"
+SMOOTHING_ONE_EURO = "one_euro"
+SMOOTHING_MODES = [SMOOTHING_NONE, SMOOTHING_EMA, SMOOTHING_ONE_EURO]
+
+# cutoff of the speed estimate in Hz
+DERIVATIVE_CUTOFF = 1.0
+# sample interval assumed when two samples carry the same timestamp
+_MIN_INTERVAL = 0.001
+
+
+def _alpha(cutoff: float, interval: float) -> float:
+    """Return the smoothing factor of a low-pass filter for one sample interval."""
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / interval)
+
+
+class RotationFilter:
+    """Smoothing filter and dead zone for the rotation of one gesture."""
+
+    __slots__ = (
+        "smoothing",
+        "min_cutoff",
+        "beta",
+        "dead_zone",
+        "value",
+        "_speed",
+        "_timestamp",
+        "_emitted",
+    )
+
+    def __init__(self, smoothing: str, min_cutoff: float, beta: float, dead_zone: float) -> None:
+        self.smoothing = smoothing
+        self.min_cutoff = min_cutoff
+        # the ema mode ignores the rotation speed
+        self.beta = beta if smoothing == SMOOTHING_ONE_EURO else 0.0
+        self.dead_zone = dead_zone
+        self.value: float | None = None
+        self._speed = 0.0
+        self._timestamp = 0
+        self._emitted: float | None = None
+
+    def reset(self) -> None:
+        """Start a new gesture."""
+        self.value = None
+        self._speed = 0.0
+        self._emitted = None
+
+    def update(self, timestamp: int, rotation: float) -> float | None:
+        """Filter a rotation sample, return None while it stays in the dead zone."""
+        value = self.value
+        if value is None or self.smoothing == SMOOTHING_NONE:
+            value = rotation
+        else:
+            interval = max((timestamp - self._timestamp) / 1000, _MIN_INTERVAL)
+            speed = (rotation - value) / interval
+            self._speed += _alpha(DERIVATIVE_CUTOFF, interval) * (speed - self._speed)
+            cutoff = self.min_cutoff + self.beta * abs(self._speed)
+            value += _alpha(cutoff, interval) * (rotation - value)
+        self.value = value
+        self._timestamp = timestamp
+
+        emitted = self._emitted
+        if emitted is not None and abs(value - emitted) < self.dead_zone:
+            return None
+        self._emitted = value
+        return value
+
+    def settle(self, rotation: float) -> float | None:
+        """Return the raw final rotation at lift if it differs from the last value let through."""
+        if self._emitted is None or rotation == self._emitted:
+            return None
+        self._emitted = rotation
+        return rotation
@@ -0,0 +1,136 @@
+"""Low overhead latency histograms and rate counters."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from time import monotonic
+from typing import Any
+
+# bucket upper bounds in seconds, four buckets per power of two from 1 us to ~70 s
+BUCKET_BOUNDS = tuple(1e-6 * 2 ** (index / 4) for index in range(105))
+
+STAGE_PARSE = "parse"
+# from receiving a sample until the queue holding it is processed
+STAGE_QUEUE = "queue"
+# the gesture stage includes the transforms and dispatches it triggers
+STAGE_GESTURE = "gesture"
+STAGE_TRANSFORM = "transform"
+STAGE_DISPATCH = "dispatch"
+STAGE_SERVICE_CALL = "service_call"
+# from receiving the lift of a gesture until its tap or final value is sent
+STAGE_LIFT_TO_DISPATCH = "lift_to_dispatch"
+STAGE_HANDLER = "handler"
+STAGE_DEVICE_TO_HA = "device_to_ha"
+
+STAGES = (
+    STAGE_PARSE,
+    STAGE_QUEUE,
+    STAGE_GESTURE,
+    STAGE_TRANSFORM,
+    STAGE_DISPATCH,
+    STAGE_SERVICE_CALL,
+    STAGE_LIFT_TO_DISPATCH,
+    STAGE_HANDLER,
+    STAGE_DEVICE_TO_HA,
+)
+
+
+class RollingHistogram:
+    """Histogram over the current and the previous time window."""
+
+    __slots__ = ("_current", "_previous")
+
+    def __init__(self) -> None:
+        self._current = array("L", bytes(array("L").itemsize * (len(BUCKET_BOUNDS) + 1)))
+        self._previous = array("L", self._current)
+
+    def record(self, seconds: float) -> None:
+        """Count one measurement."""
+        self._current[bisect_right(BUCKET_BOUNDS, seconds)] += 1
+
+    def rotate(self) -> None:
+        """Start a new window and forget the one before the previous."""
+        self._previous, self._current = self._current, self._previous
+        for index in range(len(self._current)):
+            self._current[index] = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self._current) + sum(self._previous)
+
+    def percentile(self, percentile: float) -> float | None:
+        """Return the bucket bound below which percentile % of the values fall."""
+        counts = [current + previous for current, previous in zip(self._current, self._previous)]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = total * percentile / 100
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKET_BOUNDS[min(index, len(BUCKET_BOUNDS) - 1)]
+        return BUCKET_BOUNDS[-1]
+
+
+class RateCounter:
+    """Rate of an external counter over the last finished window."""
+
+    __slots__ = ("rate", "_window_start", "_window_total")
+
+    def __init__(self) -> None:
+        self.rate = 0.0
+        self._window_start = monotonic()
+        self._window_total = 0
+
+    def rotate(self, now: float, total: int) -> None:
+        """Finish the current window at the given counter total."""
+        elapsed = now - self._window_start
+        if elapsed > 0:
+            self.rate = (total - self._window_total) / elapsed
+        self._window_start = now
+        self._window_total = total
+
+
+class DeviceMetrics:
+    """Latency histograms per processing stage plus message and error rates."""
+
+    __slots__ = ("histograms", "messages", "errors")
+
+    def __init__(self) -> None:
+        self.histograms = {stage: RollingHistogram() for stage in STAGES}
+        self.messages = RateCounter()
+        self.errors = RateCounter()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Record the duration of a stage."""
+        self.histograms[stage].record(seconds)
+
+    def rotate(self, messages: int, errors: int) -> None:
+        """Roll all windows over, given the message and error totals."""
+        now = monotonic()
+        self.messages.rotate(now, messages)
+        self.errors.rotate(now, errors)
+        for histogram in self.histograms.values():
+            histogram.rotate()
+
+    def latency(self, stage: str, percentile: float) -> float | None:
+        """Return a latency percentile of a stage in seconds."""
+        return self.histograms[stage].percentile(percentile)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary for diagnostics, latencies in milliseconds."""
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            p50 = histogram.percentile(50)
+            p99 = histogram.percentile(99)
+            stages[stage] = {
+                "count": histogram.count,
+                "p50_ms": None if p50 is None else round(p50 * 1000, 3),
+                "p99_ms": None if p99 is None else round(p99 * 1000, 3),
+            }
+        return {
+            "messages_per_s": round(self.messages.rate, 2),
+            "errors_per_s": round(self.errors.rate, 2),
+            "stages": stages,
+        }
@@ -0,0 +1,13 @@
+"""Make the integration importable as the package drea.
+
+The package __init__ sets up the MQTT integration, so it is not run: the
+modules under test are imported from a bare package module.
+"""
+from pathlib import Path
+import sys
+import types
+
+if "drea" not in sys.modules:
+    package = types.ModuleType("drea")
+    package.__path__ = [str(Path(__file__).resolve().parent.parent)]
+    sys.modules["drea"] = package
@@ -0,0 +1,37 @@
+"""Tests of the hue to RGBW lookup table."""
+import pytest
+
+from drea.colortable import COLOR_TOLERANCE, get_hue_table, hs_to_rgbw
+from drea.transforms import HUE_STEP, RgbwRotationTransform
+
+
+def test_default_table_within_tolerance() -> None:
+    """Any hue looks up a color close to the Home Assistant color functions."""
+    assert get_hue_table().max_error() <= COLOR_TOLERANCE
+
+
+def test_table_exact_at_integer_hues() -> None:
+    """The entries themselves are the converted colors."""
+    table = get_hue_table()
+    for hue in range(360):
+        assert table.rgbw(hue) == list(hs_to_rgbw(hue, 100.0))
+
+
+def test_rotation_table_exact_at_its_steps() -> None:
+    """The RGBW rotation only reads hues its table holds exactly."""
+    transform = RgbwRotationTransform("light.test", 10.0)
+    assert transform.table.resolution == HUE_STEP
+    assert transform.table.max_error(HUE_STEP) == 0
+    for rotation in range(-400, 400, 7):
+        data = transform(float(rotation))
+        if data is not None:
+            assert data["rgbw_color"] == list(hs_to_rgbw(transform.last, 100.0))
+
+
+def test_conversion_matches_home_assistant() -> None:
+    """hs_to_rgbw is the conversion of the Home Assistant color functions."""
+    color = pytest.importorskip("homeassistant.util.color")
+    for hue in range(0, 3600, 7):
+        for saturation in (0.0, 35.5, 80.0, 100.0):
+            r, g, b = color.color_hs_to_RGB(hue / 10, saturation)
+            assert hs_to_rgbw(hue / 10, saturation) == color.color_rgb_to_rgbw(r, g, b)
@@ -0,0 +1,23 @@
+"""Tests of the sample queue of a device."""
+from drea.inbox import SampleInbox
+from drea.parser import DreaSample
+
+
+def test_late_lift_is_kept() -> None:
+    """A lift ends its gesture even when the rotation samples before it are stale."""
+    inbox = SampleInbox(64, 300)
+    assert inbox.put(DreaSample(0, 2, -1.5, 0.0), 1000)
+    assert not inbox.put(DreaSample(10, 2, -1.5, -1.5), 2010)
+    assert inbox.put(DreaSample(20, 0, None, None), 2020)
+    assert inbox.stale == 1
+    assert [sample.finger_count for sample in inbox.samples] == [2, 0]
+
+
+def test_out_of_order_lift_is_kept() -> None:
+    """An out of order lift is queued without moving the newest timestamp back."""
+    inbox = SampleInbox(64, 0)
+    inbox.put(DreaSample(100, 2, 0.0, 0.0), 1000)
+    assert not inbox.put(DreaSample(50, 2, 0.0, 0.0), 1001)
+    assert inbox.put(DreaSample(60, 0, None, None), 1002)
+    assert inbox.out_of_order == 1
+    assert inbox.last_timestamp == 100
@@ -0,0 +1,19 @@
+"""Tests of the sample decoders."""
+import math
+
+from drea.parser import decode_payload, encode_frame
+
+
+def test_text_rejects_non_finite_rotations() -> None:
+    """nan and inf parse as floats but are malformed samples."""
+    batch = decode_payload("1000,2,-10,-10\n1010,2,-10,inf\n1020,2,nan,-20\n1030,0,None,None")
+    assert [sample.timestamp for sample in batch] == [1000, 1030]
+    assert batch.malformed == 2
+
+
+def test_frame_rejects_infinite_rotations() -> None:
+    """NaN means no value in a frame, infinity is malformed."""
+    frame = encode_frame([(1000, 2, -10.0, -10.0), (1010, 2, -10.0, math.inf), (1020, 0, None, None)])
+    batch = decode_payload(frame)
+    assert [(sample.timestamp, sample.rotation_sum) for sample in batch] == [(1000, -10.0), (1020, None)]
+    assert batch.malformed == 1
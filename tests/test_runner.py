@@ -0,0 +1,24 @@
+"""Tests of running the engine without Home Assistant."""
+from pathlib import Path
+import subprocess
+import sys
+
+RUNNER = Path(__file__).resolve().parent.parent / "runner.py"
+
+_LIST_IMPORTED = """
+import runpy, sys
+sys.argv = [sys.argv[1], "simulate", "--help"]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+print(sorted(name for name in sys.modules if name.split(".")[0] == "homeassistant"))
+"""
+
+
+def test_runner_does_not_import_home_assistant() -> None:
+    """The runner script and the engine modules load without Home Assistant."""
+    result = subprocess.run(
+        [sys.executable, "-c", _LIST_IMPORTED, str(RUNNER)], capture_output=True, check=True, text=True
+    )
+    assert result.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,339 @@
+"""Rotation transforms of the bound entity attributes.
+
+The base value and the limits of a transform come from the state snapshot
+taken at touch-down, so they are resolved once per gesture. Calling the
+prepared transform with a rotation then only scales, offsets, rounds to the
+resolution of the target and clamps.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any, Protocol
+
+from .colortable import get_hue_table
+from .core import State
+
+# degrees of rotation that sweep the full range of an attribute
+FULL_SCALE_ROTATION = 270.0
+
+# smallest changes worth a service call
+HUE_STEP = 1.0
+SATURATION_STEP = 1.0
+VOLUME_STEP = 0.01
+PERCENTAGE_STEP = 1.0
+# seconds
+SEEK_STEP = 1.0
+# used when a thermostat does not report target_temp_step
+DEFAULT_TEMPERATURE_STEP = 0.5
+
+
+def _scale(value_range: float) -> float:
+    """Return the change of an attribute per degree of rotation."""
+    return value_range / -FULL_SCALE_ROTATION
+
+
+class RotationTransform:
+    """Clamped linear transform of one attribute, prepared for one gesture.
+
+    Values are rounded to the step the target can actually resolve. A
+    rotation that does not change the rounded value returns None, so no
+    service call is made for it.
+    """
+
+    __slots__ = ("entity_id", "attribute", "base", "scale", "low", "high", "step", "last")
+
+    def __init__(
+        self, entity_id: str, attribute: str, base: float, scale: float, low: float, high: float, step: float
+    ) -> None:
+        self.entity_id = entity_id
+        self.attribute = attribute
+        self.base = base
+        self.scale = scale
+        self.low = low
+        self.high = high
+        self.step = step
+        # the current state counts as sent, a gesture that does not change it sends nothing
+        self.last = self.quantize(base)
+
+    def quantize(self, value: float) -> float:
+        """Round a value to the resolution of the target."""
+        step = self.step
+        return round(round(value / step) * step, 6)
+
+    def value(self, rotation: float) -> float:
+        """Return the quantized and clamped attribute value for a rotation."""
+        value = self.quantize(self.base + rotation * self.scale)
+        if value > self.high:
+            return self.high
+        if value < self.low:
+            return self.low
+        return value
+
+    def changed(self, rotation: float) -> float | None:
+        """Return the value for a rotation, None if it equals the last one returned."""
+        value = self.value(rotation)
+        if value == self.last:
+            return None
+        self.last = value
+        return value
+
+    def __call__(self, rotation: float) -> dict[str, Any] | None:
+        value = self.changed(rotation)
+        if value is None:
+            return None
+        return {"entity_id": self.entity_id, self.attribute: value}
+
+    def level(self) -> float | None:
+        """Return the last value as a percentage of the range."""
+        value_range = self.high - self.low
+        if not value_range:
+            return None
+        return (self.last - self.low) * 100 / value_range
+
+
+class IntRotationTransform(RotationTransform):
+    """Linear transform of an integer attribute like brightness or mireds."""
+
+    __slots__ = ()
+
+    def __init__(
+        self, entity_id: str, attribute: str, base: float, scale: float, low: int, high: int
+    ) -> None:
+        super().__init__(entity_id, attribute, base, scale, low, high, 1)
+
+    def quantize(self, value: float) -> int:
+        return int(value)
+
+
+class HueRotationTransform(RotationTransform):
+    """Transform of the hue, which wraps around instead of being clamped."""
+
+    __slots__ = ("saturation",)
+
+    def __init__(self, entity_id: str, hue: float, saturation: float) -> None:
+        super().__init__(entity_id, "hs_color", hue, _scale(360.0), 0.0, 360.0, HUE_STEP)
+        self.saturation = saturation
+        self.last %= 360.0
+
+    def value(self, rotation: float) -> float:
+        return self.quantize(self.base + rotation * self.scale) % 360.0
+
+    def __call__(self, rotation: float) -> dict[str, Any] | None:
+        value = self.changed(rotation)
+        if value is None:
+            return None
+        return {"entity_id": self.entity_id, "hs_color": [value, self.saturation]}
+
+
+class RgbwRotationTransform(HueRotationTransform):
+    """Transform of the hue, sent as a fully saturated RGBW color."""
+
+    __slots__ = ("table",)
+
+    def __init__(self, entity_id: str, hue: float) -> None:
+        super().__init__(entity_id, hue, 100.0)
+        # the hue only takes multiples of HUE_STEP, a table at that resolution is exact
+        self.table = get_hue_table(HUE_STEP)
+
+    def __call__(self, rotation: float) -> dict[str, Any] | None:
+        value = self.changed(rotation)
+        if value is None:
+            return None
+        return {"entity_id": self.entity_id, "rgbw_color": self.table.rgbw(value)}
+
+
+class SaturationRotationTransform(RotationTransform):
+    """Transform of the saturation at a fixed hue."""
+
+    __slots__ = ("hue",)
+
+    def __init__(self, entity_id: str, hue: float, saturation: float) -> None:
+        super().__init__(entity_id, "hs_color", saturation, _scale(100.0), 0.0, 100.0, SATURATION_STEP)
+        self.hue = hue
+
+    def __call__(self, rotation: float) -> dict[str, Any] | None:
+        value = self.changed(rotation)
+        if value is None:
+            return None
+        return {"entity_id": self.entity_id, "hs_color": [self.hue, value]}
+
+
+class ConstantTransform:
+    """Transform that sends the same data once, whatever the rotation."""
+
+    __slots__ = ("data", "sent")
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.data = data
+        self.sent = False
+
+    def __call__(self, rotation: float) -> dict[str, Any] | None:
+        if self.sent:
+            return None
+        self.sent = True
+        return dict(self.data)
+
+    def level(self) -> float | None:
+        """Return None, the data has no position in a range."""
+        return None
+
+
+class Transform(Protocol):
+    """Prepared transform of one entity."""
+
+    def __call__(self, rotation: float) -> dict[str, Any] | None:
+        """Return the service data for a rotation, None if nothing changed."""
+
+    def level(self) -> float | None:
+        """Return the last value as a percentage, None if it has none."""
+
+
+PrepareTransform = Callable[[str, State | None], Transform | None]
+
+
+def prepare_brightness(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    current_brightness = 0
+    if entity_state.state != "off":
+        current_brightness = entity_state.attributes.get("brightness") or 0
+    return IntRotationTransform(entity_id, "brightness", current_brightness, _scale(255.0), 0, 255)
+
+
+def prepare_color_temp(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    attributes = entity_state.attributes
+    color_temp_min = attributes.get("min_mireds")
+    color_temp_max = attributes.get("max_mireds")
+    if color_temp_min is None or color_temp_max is None:
+        return None
+    current_color_temp = attributes.get("color_temp")
+    if current_color_temp is None:
+        return ConstantTransform({"entity_id": entity_id, "color_temp": color_temp_max})
+    return IntRotationTransform(
+        entity_id, "color_temp", current_color_temp, _scale(color_temp_max - color_temp_min),
+        color_temp_min, color_temp_max,
+    )
+
+
+def _current_hs_color(entity_state: State) -> tuple[float | None, float | None] | None:
+    hs_color = entity_state.attributes.get("hs_color")
+    if not hs_color:
+        return None
+    return hs_color[0], hs_color[1]
+
+
+def prepare_hs_color(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    if entity_state.state == "off":
+        return ConstantTransform({"entity_id": entity_id})
+    hs_color = _current_hs_color(entity_state)
+    if hs_color is None or hs_color[0] is None:
+        return None
+    return HueRotationTransform(entity_id, hs_color[0], 100.0)
+
+
+def prepare_hs_sat(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    if entity_state.state == "off":
+        return ConstantTransform({"entity_id": entity_id})
+    hs_color = _current_hs_color(entity_state)
+    if hs_color is None:
+        return None
+    return SaturationRotationTransform(entity_id, hs_color[0] or 0.0, hs_color[1] or 100.0)
+
+
+def prepare_rgbw_color(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    if entity_state.state == "off":
+        return ConstantTransform({"entity_id": entity_id})
+    hs_color = _current_hs_color(entity_state)
+    if hs_color is None or hs_color[0] is None:
+        return None
+    return RgbwRotationTransform(entity_id, hs_color[0])
+
+
+def prepare_climate_temperature(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    attributes = entity_state.attributes
+    current_temperature = attributes.get("temperature")
+    min_temp = attributes.get("min_temp")
+    max_temp = attributes.get("max_temp")
+    if current_temperature is None or min_temp is None or max_temp is None:
+        return None
+    return RotationTransform(
+        entity_id, "temperature", current_temperature, _scale(max_temp - min_temp), min_temp, max_temp,
+        attributes.get("target_temp_step") or DEFAULT_TEMPERATURE_STEP,
+    )
+
+
+def prepare_media_player_volume(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    current_volume_level = entity_state.attributes.get("volume_level")
+    if current_volume_level is None:
+        return None
+    return RotationTransform(entity_id, "volume_level", current_volume_level, _scale(1.0), 0.0, 1.0, VOLUME_STEP)
+
+
+def prepare_cover_position(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    current_position = entity_state.attributes.get("current_position")
+    if current_position is None:
+        return None
+    return IntRotationTransform(entity_id, "position", current_position, _scale(100.0), 0, 100)
+
+
+def prepare_fan_percentage(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    attributes = entity_state.attributes
+    current_percentage = 0
+    if entity_state.state != "off":
+        current_percentage = attributes.get("percentage") or 0
+    return RotationTransform(
+        entity_id, "percentage", current_percentage, _scale(100.0), 0, 100,
+        attributes.get("percentage_step") or PERCENTAGE_STEP,
+    )
+
+
+def prepare_number_value(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    attributes = entity_state.attributes
+    min_value = attributes.get("min")
+    max_value = attributes.get("max")
+    if min_value is None or max_value is None:
+        return None
+    try:
+        current_value = float(entity_state.state)
+    except ValueError:
+        return None
+    return RotationTransform(
+        entity_id, "value", current_value, _scale(max_value - min_value), min_value, max_value,
+        attributes.get("step") or 1.0,
+    )
+
+
+def prepare_media_position(entity_id: str, entity_state: State | None) -> Transform | None:
+    if entity_state is None:
+        return None
+    attributes = entity_state.attributes
+    duration = attributes.get("media_duration")
+    position = attributes.get("media_position")
+    if not duration or position is None:
+        return None
+    updated_at = attributes.get("media_position_updated_at")
+    if entity_state.state == "playing" and isinstance(updated_at, datetime):
+        # the reported position is only updated now and then while playing
+        position += (datetime.now(timezone.utc) - updated_at).total_seconds()
+    return RotationTransform(
+        entity_id, "seek_position", min(position, duration), _scale(duration), 0.0, duration, SEEK_STEP
+    )